@@ -0,0 +1,147 @@
+"""Measure latency between key presses and the frames that show them.
+
+Runs the browser headless, with output rendered to /dev/null, and feeds it
+keys at a fixed rate - as if they were auto-repeated by a held key. For every
+sequence of keys sent, latency is the time between sending it and the end of
+the first frame rendered after its last key was handled.
+
+Without a file argument, a synthetic repository is generated in a temporary
+directory first:
+
+    python benchmarks/keypress_latency.py --lines 100000 --keys 100j
+    python benchmarks/keypress_latency.py path/to/file/in/a/repo
+"""
+
+import os
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+
+import click
+from prompt_toolkit.application import create_app_session
+from prompt_toolkit.data_structures import Size
+from prompt_toolkit.input import create_pipe_input
+from prompt_toolkit.output.vt100 import Vt100_Output
+
+from git_bbb import create_application
+
+
+def generate_repository(repo_path: Path, lines: int, commits: int) -> Path:
+    """Create a repository with a file changed in every one of its commits."""
+    env = {
+        **os.environ,
+        "GIT_AUTHOR_NAME": "Benchmark",
+        "GIT_AUTHOR_EMAIL": "benchmark@example.com",
+        "GIT_COMMITTER_NAME": "Benchmark",
+        "GIT_COMMITTER_EMAIL": "benchmark@example.com",
+    }
+
+    def git(*args):
+        subprocess.run(
+            ["git", *args],
+            cwd=repo_path,
+            env=env,
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+
+    git("init", "-q")
+    path = repo_path / "benchmark.py"
+    content = [f"line_{n} = {n}\n" for n in range(lines)]
+    for commit in range(commits):
+        # Every commit takes over an interleaved subset of the lines, so that
+        # the blame alternates between commits a lot.
+        for n in range(commit, lines, commits):
+            content[n] = f"line_{n} = {n} * {commit}\n"
+        path.write_text("".join(content))
+        git("add", path.name)
+        git("commit", "-q", "-m", f"Commit {commit}")
+    return path
+
+
+def measure(path: Path, keys: str, repeat: int, interval: float, size: Size):
+    """Return latencies of `keys` sequences sent `repeat` times, and frames."""
+    sent = []
+    handled = []
+    frames = []
+
+    with create_pipe_input() as pipe_input, open(os.devnull, "w") as devnull:
+        output = Vt100_Output(devnull, lambda: size, term="xterm")
+        with create_app_session(input=pipe_input, output=output):
+            # Resolved first, relative paths are relative to the caller's
+            # directory, not the one of the file.
+            path = path.resolve()
+            os.chdir(path.parent)
+            app = create_application(path, None, None)
+            app.after_render += lambda _: frames.append(time.perf_counter())
+
+            def on_key_press(_):
+                handled.append(time.perf_counter())
+
+            def feed():
+                # Wait for the first frame, blaming happens before it.
+                while not frames:
+                    time.sleep(interval)
+                for _ in range(repeat):
+                    sent.append(time.perf_counter())
+                    pipe_input.send_text(keys)
+                    time.sleep(interval)
+                time.sleep(0.5)
+                pipe_input.send_text("q")
+
+            def pre_run():
+                app.key_processor.after_key_press += on_key_press
+
+            app.pre_run_callables.append(pre_run)
+            threading.Thread(target=feed, daemon=True).start()
+            app.run()
+
+    latencies = []
+    for n, sent_at in enumerate(sent):
+        # Sequences are sent as a whole, latency is measured from the last of
+        # their keys being handled.
+        handled_at = handled[(n + 1) * len(keys) - 1]
+        frame = bisect_left(frames, handled_at)
+        if frame < len(frames):
+            latencies.append(frames[frame] - sent_at)
+    return latencies, len(frames)
+
+
+@click.command()
+@click.argument("path", required=False, type=click.Path(path_type=Path))
+@click.option("--keys", default="j", show_default=True)
+@click.option("--repeat", default=200, show_default=True)
+@click.option(
+    "--rate",
+    default=30.0,
+    show_default=True,
+    help="Key sequences sent per second.",
+)
+@click.option("--lines", default=20_000, show_default=True)
+@click.option("--commits", default=50, show_default=True)
+@click.option("--height", default=50, show_default=True)
+@click.option("--width", default=160, show_default=True)
+def main(path, keys, repeat, rate, lines, commits, height, width):
+    with tempfile.TemporaryDirectory() as tmp:
+        if path is None:
+            click.echo(f"Generating {lines} lines over {commits} commits...")
+            path = generate_repository(Path(tmp), lines, commits)
+        latencies, frame_count = measure(
+            path, keys, repeat, 1 / rate, Size(rows=height, columns=width)
+        )
+
+    latencies_ms = sorted(latency * 1000 for latency in latencies)
+    p95 = latencies_ms[int(len(latencies_ms) * 0.95)]
+    click.echo(f"{repeat} x {keys!r}, {frame_count} frames rendered")
+    click.echo(
+        f"latency: median {statistics.median(latencies_ms):.1f}ms, "
+        f"p95 {p95:.1f}ms, max {latencies_ms[-1]:.1f}ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -8,19 +8,61 @@ from prompt_toolkit.layout import Layout
 from prompt_toolkit.styles.pygments import style_from_pygments_cls
 from pygments.styles import get_style_by_name
 
+from subprocess import CalledProcessError
+
 from .git_plumbing import Git
-from .browser import Browser
+from .doctor import probe
+from .tabs import Tabs
+from .comparison import ComparisonView
 
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Auto-repeated keys invalidate the screen much more often than it's worth
+# redrawing it. Redraws closer to each other than this are coalesced into one.
+MIN_REDRAW_INTERVAL = 1 / 60
+
+
+def run(path, rev, ignore_revs_file, watch=False, daemon=False, compare=None):
+    app = create_application(
+        path, rev, ignore_revs_file, watch, daemon, compare
+    )
+    app.run()
+
+
+def close_on_exit(app: Application, tabs: Tabs):
+    """Close the tabs once the running application is done."""
+    app.future.add_done_callback(lambda _: tabs.close())
+
 
-def run(path, rev, ignore_revs_file):
-    git = Git(ignore_revs_file)
+def create_application(
+    path, rev, ignore_revs_file, watch=False, daemon=False, compare=None
+) -> Application:
+    git = None
+    if daemon:
+        # Imported here, so that the package doesn't import the daemon module
+        # before `python -m git_bbb.daemon` gets to run it.
+        from .daemon import attach
 
-    browser = Browser(git, rev, path, initial_lineno=1)
-    layout = Layout(browser)
+        git = attach(ignore_revs_file)
+    if git is None:
+        git = Git(ignore_revs_file)
+
+    pre_run = []
+    if compare is not None:
+        view = ComparisonView(git, path, compare, rev)
+        layout = Layout(view)
+    else:
+        try:
+            health = probe(git.repo_path)
+        except (CalledProcessError, OSError):
+            health = None
+        tabs = Tabs(git, rev, path, initial_lineno=1, health=health)
+        layout = Layout(tabs)
+        pre_run.append(lambda: close_on_exit(app, tabs))
+        if watch:
+            pre_run.append(tabs.current.watch_worktree)
 
     # TODO: make this configurable
     pygments_style = "monokai"
@@ -29,8 +71,10 @@ def run(path, rev, ignore_revs_file):
         layout=layout,
         mouse_support=True,
         style=style_from_pygments_cls(get_style_by_name(pygments_style)),
+        min_redraw_interval=MIN_REDRAW_INTERVAL,
     )
 
     app.editing_mode = EditingMode.VI
+    app.pre_run_callables.extend(pre_run)
 
-    app.run()
+    return app
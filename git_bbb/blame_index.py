@@ -0,0 +1,186 @@
+"""Searching blamed lines by the metadata of their commits."""
+
+from __future__ import annotations
+
+import re
+import time
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import datetime
+from heapq import merge
+
+from .git_plumbing import STAGING_SHA
+
+from typing import TYPE_CHECKING, Callable, Dict, List, Set, Tuple
+
+if TYPE_CHECKING:
+    from .git_plumbing import BlameLine
+
+
+TOKEN_REGEX = re.compile(r"[\w-]+")
+RELATIVE_DATE_REGEX = re.compile(r"(?P<amount>\d+)(?P<unit>[dwmy])")
+DATE_FORMAT = "%Y-%m-%d"
+SECONDS_PER_UNIT = {
+    "d": 24 * 60 * 60,
+    "w": 7 * 24 * 60 * 60,
+    "m": 30 * 24 * 60 * 60,
+    "y": 365 * 24 * 60 * 60,
+}
+QUERY_HELP = (
+    "author:, mail:, summary:, sha:, after:, before: "
+    "(dates as YYYY-MM-DD or e.g. 2w)"
+)
+
+
+class QueryError(ValueError):
+    """Raised for queries that can't be understood."""
+
+
+def _tokenize(text: str) -> Set[str]:
+    return {token.lower() for token in TOKEN_REGEX.findall(text)}
+
+
+def _parse_date(value: str) -> int:
+    """Parse absolute (YYYY-MM-DD) or relative (e.g. 2w) date to timestamp."""
+    relative = RELATIVE_DATE_REGEX.fullmatch(value)
+    if relative is not None:
+        seconds = int(relative["amount"]) * SECONDS_PER_UNIT[relative["unit"]]
+        return int(time.time()) - seconds
+    try:
+        return int(datetime.strptime(value, DATE_FORMAT).timestamp())
+    except ValueError:
+        raise QueryError(f"Invalid date: {value}") from None
+
+
+class BlameIndex:
+    """Inverted indexes over the commits of a blame.
+
+    Files have many more lines than commits, so everything is indexed per
+    commit, and each commit maps to the sorted list of rows blamed on it.
+    Queries narrow down the set of commits, and only then turn it into rows.
+    """
+
+    def __init__(self, blame_lines: List[BlameLine]):
+        self._rows_by_sha: Dict[str, List[int]] = defaultdict(list)
+        self._shas_by_author: Dict[str, Set[str]] = defaultdict(set)
+        self._shas_by_mail: Dict[str, Set[str]] = defaultdict(set)
+        self._shas_by_token: Dict[str, Set[str]] = defaultdict(set)
+        times: List[Tuple[int, str]] = []
+
+        for row, blame in enumerate(blame_lines):
+            rows = self._rows_by_sha[blame.sha]
+            rows.append(row)
+            if len(rows) > 1 or blame.sha == STAGING_SHA:
+                continue
+
+            self._shas_by_author[blame.author_name.lower()].add(blame.sha)
+            self._shas_by_mail[blame.author_mail.lower()].add(blame.sha)
+            for token in _tokenize(blame.summary):
+                self._shas_by_token[token].add(blame.sha)
+            times.append((blame.author_time, blame.sha))
+
+        times.sort()
+        self._times = [t for t, _ in times]
+        self._shas_by_time = [sha for _, sha in times]
+        self._all_shas = set(self._shas_by_time)
+
+    def query(self, query: str) -> List[int]:
+        """Return sorted rows matching all of the terms of the query.
+
+        Terms are either `field:value` pairs (see QUERY_HELP), or bare words
+        matched against author names, summaries and SHA prefixes.
+        """
+        terms = query.split()
+        if not terms:
+            raise QueryError("Empty query")
+
+        shas = set(self._all_shas)
+        for term in terms:
+            shas &= self._match_term(term)
+
+        return list(merge(*(self._rows_by_sha[sha] for sha in shas)))
+
+    def _match_term(self, term: str) -> Set[str]:
+        field, separator, value = term.partition(":")
+        if not separator:
+            return (
+                self._match_author(term)
+                | self._match_summary(term)
+                | self._match_sha(term)
+            )
+
+        matchers: Dict[str, Callable[[str], Set[str]]] = {
+            "author": self._match_author,
+            "mail": self._match_mail,
+            "summary": self._match_summary,
+            "sha": self._match_sha,
+            "after": self._match_after,
+            "since": self._match_after,
+            "before": self._match_before,
+        }
+        if field not in matchers or not value:
+            raise QueryError(f"Invalid term: {term}. Use {QUERY_HELP}")
+        return matchers[field](value)
+
+    def _match_author(self, value: str) -> Set[str]:
+        return self._match_substring(self._shas_by_author, value)
+
+    def _match_mail(self, value: str) -> Set[str]:
+        return self._match_substring(self._shas_by_mail, value)
+
+    @staticmethod
+    def _match_substring(index: Dict[str, Set[str]], value: str) -> Set[str]:
+        value = value.lower()
+        shas: Set[str] = set()
+        for key, key_shas in index.items():
+            if value in key:
+                shas |= key_shas
+        return shas
+
+    def _match_summary(self, value: str) -> Set[str]:
+        tokens = _tokenize(value)
+        if not tokens:
+            return set()
+        shas = set(self._all_shas)
+        for token in tokens:
+            shas &= self._shas_by_token.get(token, set())
+        return shas
+
+    def _match_sha(self, value: str) -> Set[str]:
+        value = value.lower()
+        return {sha for sha in self._all_shas if sha.startswith(value)}
+
+    def _match_after(self, value: str) -> Set[str]:
+        start = bisect_left(self._times, _parse_date(value))
+        return set(self._shas_by_time[start:])
+
+    def _match_before(self, value: str) -> Set[str]:
+        end = bisect_right(self._times, _parse_date(value))
+        return set(self._shas_by_time[:end])
+
+
+class MetadataSearch:
+    """Results of a query, with the means to cycle through them."""
+
+    def __init__(self, query: str, rows: List[int]):
+        self.query = query
+        self.rows = rows
+        self.row_set = set(rows)
+
+    def next_row(self, row: int) -> int:
+        """First matching row after `row`, wrapping around the file."""
+        if not self.rows:
+            return row
+        idx = bisect_right(self.rows, row)
+        return self.rows[idx % len(self.rows)]
+
+    def previous_row(self, row: int) -> int:
+        """Last matching row before `row`, wrapping around the file."""
+        if not self.rows:
+            return row
+        idx = bisect_left(self.rows, row) - 1
+        return self.rows[idx % len(self.rows)]
+
+    def position(self, row: int) -> int:
+        """Number of matches up to & including `row`."""
+        return bisect_right(self.rows, row)
@@ -1,14 +1,18 @@
 from __future__ import annotations
 
-from collections import defaultdict
+from collections import namedtuple
+from subprocess import CalledProcessError
 
-from prompt_toolkit.application import run_in_terminal
+from prompt_toolkit.application import get_app
+from prompt_toolkit.eventloop import run_in_executor_with_context
 from prompt_toolkit.lexers import PygmentsLexer
 from prompt_toolkit.buffer import Buffer, Document
-from prompt_toolkit.filters import Condition
-from prompt_toolkit.layout.processors import TabsProcessor
+from prompt_toolkit.filters import Condition, has_focus
+from prompt_toolkit.key_binding.vi_state import InputMode
+from prompt_toolkit.layout.processors import BeforeInput, TabsProcessor
 from prompt_toolkit.layout import (
     HSplit,
+    VSplit,
     Window,
     BufferControl,
     FormattedTextControl,
@@ -21,17 +25,23 @@ from prompt_toolkit.layout import (
 )
 from prompt_toolkit.widgets import SearchToolbar
 
-from .git_plumbing import STAGING_SHA, Git
+from .daemon import DaemonError
+from .git_plumbing import FULL_SHA_REGEX, STAGING_SHA, Git
+from .commit_details import CommitDetails, CommitDetailsPane
+from .line_mapping import LineMapper
+from .line_trace import LineTracePane
+from .watch import BlamePatch, FileWatcher
 from .undo_redo import RevStack, RevBrowseInfo
-from .key_bindings import generate_bindings
+from .key_bindings import generate_bindings, generate_metadata_query_bindings
+from .blame_index import BlameIndex, MetadataSearch, QueryError
 
-from typing import TYPE_CHECKING, List, Optional, Dict
+from typing import TYPE_CHECKING, Dict, List, Optional, Set, Tuple
 
 if TYPE_CHECKING:
     from pathlib import Path
     from prompt_toolkit.layout import WindowRenderInfo
     from prompt_toolkit.formatted_text import StyleAndTextTuples
-    from .git_plumbing import BlameLine
+    from .git_plumbing import BlameLine, TraceStop
 
 
 MAX_SHA_CHARS_SHOWN = 12
@@ -57,18 +67,49 @@ class Statusbar(Window):
         self._control.text = new_text
 
 
+WarpTarget = namedtuple("WarpTarget", ["rev", "path", "lineno"])
+
+
 class Browser(HSplit):
-    def __init__(self, git: Git, rev: str, path: Path, initial_lineno: int):
+    def __init__(
+        self,
+        git: Git,
+        rev: str,
+        path: Path,
+        initial_lineno: int,
+        line_mapper: Optional[LineMapper] = None,
+        commit_details: Optional[CommitDetails] = None,
+        ignored_revs: Tuple[str, ...] = (),
+        reverse_until: Optional[str] = None,
+    ):
         self._git = git
-        self._undo_redo_stack = RevStack(RevBrowseInfo(rev, path))
-        self._lineno_cache: Dict[str, int] = defaultdict(lambda: 1)
+        self._undo_redo_stack = RevStack(
+            RevBrowseInfo(rev, path, reverse_until)
+        )
+        # Browsers in one session can share these, along with `git`
+        self._line_mapper = line_mapper or LineMapper(git)
         self._content = ""
         self._current_sha: Optional[str] = None
         self._current_path: Optional[Path] = None
         self._blame_lines: List[BlameLine] = []
         self._shas: List[str] = []
-
-        self._search_buffer = Buffer(multiline=False)
+        self._watcher: Optional[FileWatcher] = None
+        # Revs ignored on top of the ignore-revs file, for this session only,
+        # in the order they were ignored in
+        self._ignored_revs = ignored_revs
+        # When set, lines are blamed with `--reverse <rev>..<reverse_until>`
+        self._reverse_until = reverse_until
+        self._reblaming = False
+        self._reblame_again = False
+        self._blame_index: Optional[BlameIndex] = None
+        self._metadata_search: Optional[MetadataSearch] = None
+        self._input_mode_before_query = InputMode.NAVIGATION
+
+        self._search_buffer = Buffer(
+            multiline=False,
+            # Searching through the text takes over n & N again.
+            on_text_changed=lambda _: self._end_metadata_search(),
+        )
         self._search_toolbar = SearchToolbar(
             self._search_buffer,
             vi_mode=True,
@@ -76,8 +117,10 @@ class Browser(HSplit):
         self._source_buffer = Buffer(
             name="source",
             read_only=True,
-            on_cursor_position_changed=lambda _: self._update_statusbar(),
+            on_cursor_position_changed=lambda _: self._on_cursor_moved(),
         )
+        # False while typing into one of the prompts, e.g. the search toolbar
+        self.source_has_focus = has_focus(self._source_buffer)
         self._source_buffer_control = BufferControl(
             self._source_buffer,
             include_default_input_processors=False,
@@ -89,6 +132,22 @@ class Browser(HSplit):
             key_bindings=generate_bindings(self),
         )
 
+        self._metadata_query_buffer = Buffer(
+            multiline=False,
+            accept_handler=self._accept_metadata_query,
+        )
+        self._metadata_query_toolbar = ConditionalContainer(
+            Window(
+                BufferControl(
+                    self._metadata_query_buffer,
+                    input_processors=[BeforeInput("meta: ")],
+                    key_bindings=generate_metadata_query_bindings(self),
+                ),
+                height=1,
+            ),
+            filter=has_focus(self._metadata_query_buffer),
+        )
+
         self._sha_list_margin = CommitSHAMargin()
         self._cursor_margin = CursorMargin()
 
@@ -102,32 +161,44 @@ class Browser(HSplit):
             ),
         )
 
+        self._details_visible = False
+        self._commit_details_pane = CommitDetailsPane(
+            commit_details or CommitDetails(git),
+            filter=Condition(lambda: self._details_visible),
+        )
+
+        source_window = FloatContainer(
+            content=Window(
+                left_margins=[
+                    ConditionalMargin(
+                        self._cursor_margin,
+                        filter=not_browsing_empty_file,
+                    ),
+                    ConditionalMargin(
+                        self._sha_list_margin, not_browsing_empty_file
+                    ),
+                    PaddingMargin(1),
+                    ConditionalMargin(
+                        NumberedMargin(),
+                        filter=not_browsing_empty_file,
+                    ),
+                ],
+                content=self._source_buffer_control,
+                always_hide_cursor=True,
+            ),
+            floats=[self._empty_file_float],
+        )
+
+        self._line_trace_pane = LineTracePane(git)
+
         self._statusbar = Statusbar("", style="bg:#333")
         super().__init__(
             [
-                FloatContainer(
-                    content=Window(
-                        left_margins=[
-                            ConditionalMargin(
-                                self._cursor_margin,
-                                filter=not_browsing_empty_file,
-                            ),
-                            ConditionalMargin(
-                                self._sha_list_margin, not_browsing_empty_file
-                            ),
-                            PaddingMargin(1),
-                            ConditionalMargin(
-                                NumberedMargin(),
-                                filter=not_browsing_empty_file,
-                            ),
-                        ],
-                        content=self._source_buffer_control,
-                        always_hide_cursor=True,
-                    ),
-                    floats=[self._empty_file_float],
-                ),
+                VSplit([source_window, self._commit_details_pane]),
+                self._line_trace_pane,
                 self._statusbar,
                 self._search_toolbar,
+                self._metadata_query_toolbar,
             ]
         )
 
@@ -150,11 +221,28 @@ class Browser(HSplit):
         path: Path,
         line_no: int,
     ):
-        blame_lines = self._git.blame(path, rev)
+        blame_lines = self._git.blame(
+            path,
+            rev,
+            ignore_revs=frozenset(self._ignored_revs),
+            reverse_until=self._reverse_until,
+        )
+        self._show_blame(rev, path, blame_lines, line_no)
+
+    def _show_blame(
+        self,
+        rev: Optional[str],
+        path: Path,
+        blame_lines: List[BlameLine],
+        line_no: int,
+    ):
         self._current_path = path
         self._current_sha = rev
         self._blame_lines = blame_lines
         self._shas = [b.sha for b in self._blame_lines]
+        self._blame_index = None
+        if self._metadata_search is not None:
+            self._run_metadata_query(self._metadata_search.query)
 
         output = "".join([b.content for b in self._blame_lines])
         output = output.rstrip("\n")  # Do not render empty line at the end
@@ -178,7 +266,113 @@ class Browser(HSplit):
         # XXX: statusbar has to be updated _after_ updating the cursor
         # position, otherwise the row might be too high for
         # self.current_blame_line, which will lead to an IndexError.
+        self._on_cursor_moved()
+
+    def watch_worktree(self):
+        """Follow changes made to the browsed file in the working tree.
+
+        Has to be called from within the running application. Only the
+        working tree view of the initially browsed path is updated.
+        """
+        if self._watcher is not None:
+            return
+        self._watcher = FileWatcher(
+            self._undo_redo_stack.stack[0].file_path,
+            self._on_worktree_change,
+        )
+        self._watcher.start()
+
+    def close(self):
+        """Stop following changes made to the working tree, if it was."""
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+
+    def _on_worktree_change(self):
+        if self._reblaming:
+            self._reblame_again = True
+            return
+        get_app().create_background_task(self._reblame_worktree())
+
+    async def _reblame_worktree(self):
+        self._reblaming = True
+        try:
+            self._reblame_again = True
+            while self._reblame_again:
+                self._reblame_again = False
+                await self._patch_worktree_blame()
+        finally:
+            self._reblaming = False
+
+    async def _patch_worktree_blame(self):
+        if self._watcher is None:
+            # Closed in the meantime
+            return
+        path = self._watcher.path
+        if self._current_sha is not None or self._current_path != path:
+            return
+
+        try:
+            with open(
+                path, encoding="utf-8", errors="replace", newline=""
+            ) as f:
+                content = f.read()
+        except OSError:
+            # Editors may remove the file for a moment while saving it
+            return
+        # Git splits lines on LF only, unlike str.splitlines()
+        new_lines = [line + "\n" for line in content.split("\n")]
+        if content.endswith("\n") or not content:
+            del new_lines[-1]
+
+        old_blames = self._blame_lines
+        patch = BlamePatch(old_blames, new_lines)
+        try:
+            if not old_blames or patch.needs_full_reblame:
+                blame_lines = await self._blame_worktree(path)
+            elif patch.changed_line_ranges:
+                try:
+                    changed_blames = await run_in_executor_with_context(
+                        self._git.blame,
+                        path,
+                        None,
+                        patch.changed_line_ranges,
+                        frozenset(self._ignored_revs),
+                    )
+                except CalledProcessError:
+                    # File changed again after reading it, so the ranges
+                    # might be out of it already.
+                    blame_lines = await self._blame_worktree(path)
+                else:
+                    blame_lines = patch.apply(changed_blames)
+            else:
+                # Only removed lines
+                blame_lines = patch.apply([])
+        except (CalledProcessError, DaemonError):
+            # Next change of the file will trigger another try
+            return
+
+        # User might have warped away while git was running
+        if self._current_sha is not None or self._current_path != path:
+            return
+
+        row = patch.translate_row(self.current_line)
+        self._show_blame(None, path, blame_lines, row + 1)
+        get_app().invalidate()
+
+    async def _blame_worktree(self, path: Path) -> List[BlameLine]:
+        return await run_in_executor_with_context(
+            self._git.blame, path, None, (), frozenset(self._ignored_revs)
+        )
+
+    def _on_cursor_moved(self):
         self._update_statusbar()
+        if self._details_visible:
+            self._update_commit_details()
+
+    def _update_commit_details(self):
+        blame = self.current_blame_line
+        self._commit_details_pane.sha = blame.sha if blame else None
 
     # FIXME: this also needs to run on mouse presses
     def _update_statusbar(self):
@@ -186,13 +380,30 @@ class Browser(HSplit):
         if blame is None:
             # File is empty for current revision
             summary = "(empty file)"
-        elif blame.sha != STAGING_SHA:
-            summary = blame.summary
-        else:
+        elif blame.sha == STAGING_SHA:
             summary = "(Uncommitted) " + blame.summary
+        elif blame.sha == self._reverse_until:
+            summary = "(Still present) " + blame.summary
+        elif self._reverse_until is not None:
+            summary = "(Last seen in) " + blame.summary
+        else:
+            summary = blame.summary
         statusbar_content = [
             ("#ffe100", summary),
         ]
+        if self._metadata_search is not None:
+            search = self._metadata_search
+            position = search.position(self.current_line)
+            statusbar_content.append(
+                (
+                    "#7777ee",
+                    f" [{search.query}: {position}/{len(search.rows)}]",
+                )
+            )
+        if self._ignored_revs:
+            statusbar_content.append(
+                ("#777", f" ({len(self._ignored_revs)} revs ignored)")
+            )
         self._statusbar.text = statusbar_content
 
     @property
@@ -222,40 +433,238 @@ class Browser(HSplit):
         self._source_buffer.cursor_position = new_cursor_position
 
     def warp(self):
-        self._save_lineno_checkpoint()
-        blame = self.current_blame_line
-        new_file_path = blame.original_filename
-        new_rev = blame.sha
-        new_lineno = blame.original_line_number
-        self._browse_blame(new_rev, new_file_path, new_lineno)
+        target = self.warp_target()
+        if target is None:
+            return
+        self._browse_blame(*target)
         self._add_undo_point()
 
     def warp_previous(self):
-        self._save_lineno_checkpoint()
+        target = self.previous_warp_target()
+        if target is None:
+            return
+        self._browse_blame(*target)
+        self._add_undo_point()
+
+    def warp_target(self) -> Optional[WarpTarget]:
+        """Revision, path & line number the indicated line comes from."""
         blame = self.current_blame_line
+        if blame is None or blame.sha == self._reverse_until:
+            # Line is still there at the end of the range, there's no
+            # revision range left to reverse blame.
+            return None
+        return WarpTarget(
+            blame.sha, blame.original_filename, blame.original_line_number
+        )
+
+    def previous_warp_target(self) -> Optional[WarpTarget]:
+        """Same as `warp_target`, but for the parent of the indicated commit.
+
+        In reverse, that's the revision that changed or removed the line.
+        """
+        blame = self.current_blame_line
+        if blame is None or blame.previous_sha is None:
+            # Line comes from a root commit, there's nothing before it
+            return None
         new_file_path = blame.previous_filename
         new_rev = blame.previous_sha
-        new_lineno = blame.original_line_number
-        self._browse_blame(new_rev, new_file_path, new_lineno)
+        # Original line number is the one in the blamed commit - the parent
+        # may have the line elsewhere, or not have it at all.
+        new_lineno = self._line_mapper.translate(
+            blame.original_line_number,
+            (blame.sha, blame.original_filename),
+            (new_rev, new_file_path),
+        )
+        return WarpTarget(new_rev, new_file_path, new_lineno)
+
+    @property
+    def title(self) -> str:
+        """Short description of what is browsed, e.g. for tab labels."""
+        rev = self._current_sha
+        if rev is None:
+            rev_label = "worktree"
+        elif FULL_SHA_REGEX.fullmatch(rev):
+            rev_label = rev[:MAX_SHA_CHARS_SHOWN]
+        else:
+            rev_label = rev
+        return f"{self._current_path.name}@{rev_label}"
+
+    @property
+    def ignored_revs(self) -> Tuple[str, ...]:
+        return self._ignored_revs
+
+    @property
+    def reverse_until(self) -> Optional[str]:
+        return self._reverse_until
+
+    @property
+    def reverse(self) -> bool:
+        """True if lines are blamed to the last revisions they were seen in."""
+        return self._reverse_until is not None
+
+    def toggle_reverse(self):
+        """Switch between normal blame and reverse blame up to HEAD.
+
+        In reverse, the blame shows the last revision each line survived to,
+        and warping to the parent goes forward in history instead - to the
+        revision which changed or removed the line.
+        """
+        rev = self._current_sha
+        if self.reverse:
+            self._reverse_until = None
+        else:
+            head = self._git.rev_parse("HEAD")
+            if rev is None or rev == STAGING_SHA:
+                rev = head
+            if rev == head:
+                self._statusbar.text = [
+                    ("#ff5f5f", "Nothing newer than HEAD to reverse blame.")
+                ]
+                return
+            self._reverse_until = head
+        self._browse_blame(rev, self._current_path, self.current_line + 1)
+        self._add_undo_point()
+
+    def toggle_ignore_current_sha(self):
+        """Ignore the indicated commit when blaming, or stop ignoring it."""
+        blame = self.current_blame_line
+        if blame is None or blame.sha == STAGING_SHA:
+            return
+        if blame.sha in self._ignored_revs:
+            self._set_ignored_revs(
+                tuple(rev for rev in self._ignored_revs if rev != blame.sha)
+            )
+        else:
+            self._set_ignored_revs((*self._ignored_revs, blame.sha))
+
+    def unignore_last_ignored_rev(self):
+        """Stop ignoring the commit that was ignored most recently.
+
+        Lines of an ignored commit are blamed on other ones, so it can't be
+        picked with the cursor anymore.
+        """
+        self._set_ignored_revs(self._ignored_revs[:-1])
+
+    def clear_ignored_revs(self):
+        """Stop ignoring all of the commits ignored in this session."""
+        self._set_ignored_revs(())
+
+    def _set_ignored_revs(self, ignored_revs: Tuple[str, ...]):
+        if ignored_revs == self._ignored_revs:
+            return
+        self._ignored_revs = ignored_revs
+        self._browse_blame(
+            self._current_sha, self._current_path, self.current_line + 1
+        )
+
+    @property
+    def metadata_search_active(self) -> bool:
+        return self._metadata_search is not None
+
+    def start_metadata_search(self):
+        """Prompt for a query over authors, summaries, dates & SHAs."""
+        app = get_app()
+        self._input_mode_before_query = app.vi_state.input_mode
+        app.vi_state.input_mode = InputMode.INSERT
+        app.layout.focus(self._metadata_query_buffer)
+
+    def cancel_metadata_search(self):
+        self._metadata_query_buffer.reset()
+        self._leave_metadata_query_toolbar()
+
+    def _leave_metadata_query_toolbar(self):
+        app = get_app()
+        app.vi_state.input_mode = self._input_mode_before_query
+        app.layout.focus(self._source_buffer)
+
+    def _accept_metadata_query(self, buffer: Buffer) -> bool:
+        self._leave_metadata_query_toolbar()
+        try:
+            self._run_metadata_query(buffer.text)
+        except QueryError as e:
+            self._end_metadata_search()
+            self._statusbar.text = [("#ff5f5f", str(e))]
+            return False
+
+        self.next_metadata_match()
+        # Cursor might not have moved, e.g. if nothing matched, so the
+        # statusbar wouldn't show the new search otherwise.
+        self._update_statusbar()
+        return False
+
+    def _run_metadata_query(self, query: str):
+        # Index is built once per blame, on first use.
+        if self._blame_index is None:
+            self._blame_index = BlameIndex(self._blame_lines)
+        self._metadata_search = MetadataSearch(
+            query, self._blame_index.query(query)
+        )
+        self._sha_list_margin.highlighted_rows = self._metadata_search.row_set
+
+    def _end_metadata_search(self):
+        if self._metadata_search is None:
+            return
+        self._metadata_search = None
+        self._sha_list_margin.highlighted_rows = set()
+        self._update_statusbar()
+
+    def next_metadata_match(self):
+        self.current_line = self._metadata_search.next_row(self.current_line)
+
+    def previous_metadata_match(self):
+        self.current_line = self._metadata_search.previous_row(
+            self.current_line
+        )
+
+    def toggle_line_trace(self):
+        """Trace the history of the line under cursor, or hide the trace."""
+        if self._line_trace_pane.visible:
+            self._line_trace_pane.visible = False
+            return
+
+        blame = self.current_blame_line
+        if blame is None or blame.sha == STAGING_SHA:
+            # Nothing committed to trace
+            return
+        self._line_trace_pane.trace(
+            blame.sha, blame.original_filename, blame.original_line_number
+        )
+
+    def warp_to_older_trace_stop(self):
+        self._warp_to_trace_stop(self._line_trace_pane.select_older())
+
+    def warp_to_newer_trace_stop(self):
+        self._warp_to_trace_stop(self._line_trace_pane.select_newer())
+
+    def _warp_to_trace_stop(self, stop: Optional[TraceStop]):
+        if stop is None:
+            return
+        self._browse_blame(stop.sha, stop.path, stop.line_number)
         self._add_undo_point()
 
     def _add_undo_point(self):
         path = self._current_path
         rev = self._current_sha
-        rev_info = RevBrowseInfo(rev, path)
+        rev_info = RevBrowseInfo(rev, path, self._reverse_until)
         self._undo_redo_stack.do(rev_info)
 
-    def _save_lineno_checkpoint(self):
-        lineno = self.current_line + 1
-        self._lineno_cache[self._current_sha] = lineno
+    def _translate_current_line(self, rev: Optional[str], path: Path) -> int:
+        """Map cursor position onto the given revision of a file."""
+        return self._line_mapper.translate(
+            self.current_line + 1,
+            (self._current_sha, self._current_path),
+            (rev, path),
+        )
 
+    # Counted & auto-repeated motions jump straight to the target line, so
+    # that the cursor (and with it the statusbar) is updated only once.
     def cursor_down(self, count=1):
-        for _ in range(count):
-            self._source_buffer_control.move_cursor_down()
+        self.current_line = max(
+            0, min(self.current_line + count, len(self._shas) - 1)
+        )
 
     def cursor_up(self, count=1):
-        for _ in range(count):
-            self._source_buffer_control.move_cursor_up()
+        self.current_line = max(0, self.current_line - count)
 
     def go_to_first_line(self):
         self._source_buffer.cursor_position = 0
@@ -263,11 +672,17 @@ class Browser(HSplit):
     def go_to_last_line(self):
         self._source_buffer.cursor_position = len(self._content)
 
-    def run_git_show_for_line(self):
-        # FIXME: this makes the screen filcker temporarily with the contents of
-        # the terminal as seen before running the app. It's distracting and
-        # ugly.
-        run_in_terminal(lambda: self._git.show(self.current_blame_line.sha))
+    def toggle_commit_details(self):
+        """Show or hide the pane with details of the indicated commit."""
+        self._details_visible = not self._details_visible
+        if self._details_visible:
+            self._update_commit_details()
+
+    def scroll_commit_details_down(self):
+        self._commit_details_pane.scroll_down()
+
+    def scroll_commit_details_up(self):
+        self._commit_details_pane.scroll_up()
 
     def go_to_next_line_of_current_sha(self, wrap=True):
         try:
@@ -318,23 +733,23 @@ class Browser(HSplit):
         )
 
     def undo(self) -> None:
-        self._save_lineno_checkpoint()
         rev_info = self._undo_redo_stack.undo()
         if rev_info is None:
             return
 
-        rev, file_path = rev_info
-        lineno = self._lineno_cache[rev]
+        rev, file_path, reverse_until = rev_info
+        lineno = self._translate_current_line(rev, file_path)
+        self._reverse_until = reverse_until
         self._browse_blame(rev, file_path, lineno)
 
     def redo(self) -> None:
-        self._save_lineno_checkpoint()
         rev_info = self._undo_redo_stack.redo()
         if rev_info is None:
             return
 
-        rev, file_path = rev_info
-        lineno = self._lineno_cache[rev]
+        rev, file_path, reverse_until = rev_info
+        lineno = self._translate_current_line(rev, file_path)
+        self._reverse_until = reverse_until
         self._browse_blame(rev, file_path, lineno)
 
 
@@ -346,6 +761,8 @@ class CursorMargin(Margin):
     def __init__(self):
         self._shas = []
         self._max_height = 0
+        self._first_rows: Dict[str, int] = {}
+        self._last_rows: Dict[str, int] = {}
 
     @property
     def shas(self):
@@ -355,6 +772,13 @@ class CursorMargin(Margin):
     def shas(self, shas: List[str]):
         self._shas = shas
         self._max_height = len(shas)
+        # Known once per blame, so that rendering a frame only has to look at
+        # the rows that are visible.
+        self._first_rows = {}
+        self._last_rows = {}
+        for row, sha in enumerate(shas):
+            self._first_rows.setdefault(sha, row)
+            self._last_rows[sha] = row
 
     def create_margin(
         self, winfo: WindowRenderInfo, _: int, height: int
@@ -365,42 +789,38 @@ class CursorMargin(Margin):
 
         current_row = winfo.ui_content.cursor_position.y
         current_sha = self.shas[current_row]
-        pipes = self.render_pipes(current_sha)
-        margin = pipes[
-            current_row - lines_above : current_row + lines_below + 1
-        ]
+        margin = self.render_pipes(
+            current_sha,
+            current_row - lines_above,
+            min(current_row + lines_below + 1, len(self.shas)),
+        )
         margin[current_line] = self.CURSOR
         return margin
 
-    def render_pipes(self, cursor_sha: str) -> StyleAndTextTuples:
-        """Render a pipeline that shows where current sha is in the file."""
-        row_has_current_sha = [cursor_sha == sha for sha in self.shas]
-        first_row_with_same_sha = row_has_current_sha.index(True)
-        last_row_with_same_sha = (
-            len(self.shas) - row_has_current_sha[::-1].index(True) - 1
-        )
-
-        pipes: StyleAndTextTuples
-
-        # Empty characters before the first SHA
-        pipes = [("", "\n")] * first_row_with_same_sha
-
-        # + and | pipes
-        for is_current in row_has_current_sha[
-            first_row_with_same_sha : last_row_with_same_sha + 1
-        ]:
-            pipe_char = UTF_VERTICAL_T_R if is_current else UTF_VERTICAL_BAR
-            pipes.append((self.PIPE_STYLE, pipe_char + "\n"))
-
-        # Corners for the first and last sha
-        pipes[first_row_with_same_sha] = (
-            self.PIPE_STYLE,
-            UTF_UPPER_LEFT_CORNER + "\n",
-        )
-        pipes[last_row_with_same_sha] = (
-            self.PIPE_STYLE,
-            UTF_LOWER_LEFT_CORNER + "\n",
-        )
+    def render_pipes(
+        self, cursor_sha: str, start: int, end: int
+    ) -> StyleAndTextTuples:
+        """Render a pipeline that shows where current sha is in the file.
+
+        Only rows from `start` up to `end` are rendered.
+        """
+        first_row_with_same_sha = self._first_rows[cursor_sha]
+        last_row_with_same_sha = self._last_rows[cursor_sha]
+
+        pipes: StyleAndTextTuples = []
+        for row in range(start, end):
+            if row < first_row_with_same_sha or row > last_row_with_same_sha:
+                pipes.append(("", "\n"))
+            # Corners for the first and last sha
+            elif row == last_row_with_same_sha:
+                pipes.append((self.PIPE_STYLE, UTF_LOWER_LEFT_CORNER + "\n"))
+            elif row == first_row_with_same_sha:
+                pipes.append((self.PIPE_STYLE, UTF_UPPER_LEFT_CORNER + "\n"))
+            # + and | pipes
+            elif self.shas[row] == cursor_sha:
+                pipes.append((self.PIPE_STYLE, UTF_VERTICAL_T_R + "\n"))
+            else:
+                pipes.append((self.PIPE_STYLE, UTF_VERTICAL_BAR + "\n"))
 
         return pipes
 
@@ -410,10 +830,12 @@ class CursorMargin(Margin):
 
 class CommitSHAMargin(Margin):
     WIDTH = MAX_SHA_CHARS_SHOWN
+    HIGHLIGHT_STYLE = "bg:#444"
 
     def __init__(self):
         self._shas = []
         self._max_height = 0
+        self.highlighted_rows: Set[int] = set()
 
     @property
     def shas(self):
@@ -452,10 +874,16 @@ class CommitSHAMargin(Margin):
             )
             for n in range(start, end)
         ]
+        self._highlight_rows(start, margin_text)
         self._highlight_current_line(winfo, margin_text)
 
         return margin_text
 
+    def _highlight_rows(self, start: int, rows: StyleAndTextTuples):
+        for n, (style, text) in enumerate(rows, start):
+            if n in self.highlighted_rows:
+                rows[n - start] = (f"{style} {self.HIGHLIGHT_STYLE}", text)
+
     @staticmethod
     def _highlight_current_line(
         winfo: WindowRenderInfo, rows: StyleAndTextTuples
@@ -0,0 +1,83 @@
+"""Small caching primitives shared by the browser and git plumbing."""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+
+from typing import Callable, Generic, Hashable, Optional, Tuple, TypeVar
+
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class LRUCache(Generic[K, V]):
+    """Mapping that forgets least recently used entries over `max_entries`.
+
+    If `max_weight` is given, entries are also evicted until the sum of their
+    weights, as returned by `weigh`, fits in it. This lets callers bound the
+    memory use by e.g. line count instead of entry count.
+
+    Access is guarded with a lock, so that it can be shared between the UI
+    thread and the executor threads that fetch data from git.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        max_weight: Optional[int] = None,
+        weigh: Callable[[V], int] = lambda _: 1,
+    ):
+        assert max_entries > 0
+        self.max_entries = max_entries
+        self.max_weight = max_weight
+        self._weigh = weigh
+        self._entries: OrderedDict[K, Tuple[V, int]] = OrderedDict()
+        self._weight = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: K, default: Optional[V] = None) -> Optional[V]:
+        with self._lock:
+            try:
+                self._entries.move_to_end(key)
+            except KeyError:
+                return default
+            return self._entries[key][0]
+
+    def __getitem__(self, key: K) -> V:
+        with self._lock:
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+    def __setitem__(self, key: K, value: V):
+        weight = self._weigh(value)
+        with self._lock:
+            if key in self._entries:
+                self._weight -= self._entries.pop(key)[1]
+            self._entries[key] = (value, weight)
+            self._weight += weight
+            while len(self._entries) > self.max_entries or (
+                self.max_weight is not None
+                and self._weight > self.max_weight
+                and len(self._entries) > 1
+            ):
+                _, (_, evicted_weight) = self._entries.popitem(last=False)
+                self._weight -= evicted_weight
+
+    def __contains__(self, key: object) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    @property
+    def weight(self) -> int:
+        return self._weight
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._weight = 0
@@ -1,8 +1,18 @@
 import click
 import pathlib
+import subprocess
 import sys
 
 from . import run
+from .comparison import ComparisonError
+from .doctor import (
+    estimate_blame_cost,
+    format_timing,
+    probe,
+    time_blame,
+    write_commit_graph,
+)
+from .git_plumbing import Git
 
 
 @click.command(name=sys.argv[0])
@@ -20,6 +30,7 @@ from . import run
         exists=True,
         readable=True,
         dir_okay=False,
+        resolve_path=True,
     ),
 )
 @click.option(
@@ -33,9 +44,55 @@ from . import run
         "values."
     ),
 )
+@click.option(
+    "--watch",
+    is_flag=True,
+    default=False,
+    help=(
+        "Follow changes made to the file in the working tree, updating the "
+        "blame as the file is saved. Can't be used together with --rev."
+    ),
+)
+@click.option(
+    "--daemon",
+    is_flag=True,
+    default=False,
+    help=(
+        "Use a background daemon shared by all git-bbb instances browsing "
+        "this repository, starting it if it's not running yet. Blames "
+        "computed by one instance are reused by the others."
+    ),
+)
+@click.option(
+    "--compare",
+    default=None,
+    metavar="old-revision",
+    help=(
+        "Instead of browsing, list the lines which are blamed on a different "
+        "commit than in the old revision, i.e. changed ownership between the "
+        "old revision and the one given by --rev (or the working tree)."
+    ),
+)
+@click.option(
+    "--doctor",
+    is_flag=True,
+    default=False,
+    help=(
+        "Instead of browsing, check if the repository is set up for fast "
+        "blaming, and offer to fix it. If a file is given, times blaming it "
+        "before & after the fix."
+    ),
+)
+@click.option(
+    "--yes",
+    is_flag=True,
+    default=False,
+    help="With --doctor, apply the fix without asking.",
+)
 @click.argument(
     "path",
     metavar="file",
+    required=False,
     type=click.Path(
         # FIXME: the checks here need to be done based on the revision;
         # different revisions may contain different file paths, not necesasrily
@@ -47,5 +104,106 @@ from . import run
         resolve_path=True,
     ),
 )
-def git_bbb(path, rev, ignore_revs_file):
-    run(path, rev, ignore_revs_file)
+def git_bbb(path, rev, ignore_revs_file, watch, daemon, compare, doctor, yes):
+    if yes and not doctor:
+        raise click.BadOptionUsage("--yes", "--yes is meant for --doctor.")
+    if doctor:
+        run_doctor(path, yes)
+        return
+    if path is None:
+        raise click.MissingParameter(
+            param_type="argument", param_hint="'file'"
+        )
+    if watch and rev is not None:
+        raise click.BadOptionUsage(
+            "--watch", "Only the working tree can be watched, not a --rev."
+        )
+    if watch and compare is not None:
+        raise click.BadOptionUsage(
+            "--watch", "--watch can't be used together with --compare."
+        )
+    try:
+        run(path, rev, ignore_revs_file, watch, daemon, compare)
+    except ComparisonError as e:
+        raise click.ClickException(str(e))
+    except subprocess.CalledProcessError:
+        if compare is None:
+            raise
+        # Git has already said what went wrong on stderr
+        raise click.ClickException(
+            f"Could not compare {path.name} between {compare} and "
+            f"{rev if rev is not None else 'the working tree'}."
+        )
+
+
+def run_doctor(path, yes):
+    """Check if the repository is set up for fast blaming.
+
+    Reports the state of the commit-graph and multi-pack-index, and offers to
+    write a commit-graph with changed-path Bloom filters. If a file is given,
+    estimates the cost of blaming it, and times the blame before & after
+    writing the commit-graph.
+    """
+    repo_path = Git.show_toplevel()
+    health = probe(repo_path)
+
+    click.echo(f"Repository: {repo_path}")
+    if health.has_commit_graph:
+        click.echo(
+            f"Commit-graph: {health.commit_graph_commits} commits in "
+            f"{health.commit_graph_layers} layer(s), Bloom filters: "
+            f"{_yes_no(health.has_bloom_filters)}, contains HEAD: "
+            f"{_yes_no(health.head_in_commit_graph)}"
+        )
+    else:
+        click.echo("Commit-graph: none")
+    click.echo(
+        f"Packs: {health.pack_count} ({health.pack_size // 1024 ** 2} MiB), "
+        f"multi-pack-index: {_yes_no(health.has_multi_pack_index)}"
+    )
+
+    before = None
+    if path is not None:
+        try:
+            cost = estimate_blame_cost(repo_path, path)
+        except subprocess.CalledProcessError:
+            click.echo(f"{path.name}: not present at HEAD, can't be timed")
+            path = None
+        else:
+            before = time_blame(repo_path, path)
+            click.echo(
+                f"{path.name}: {cost.line_count} lines, changed in "
+                f"{cost.file_commit_count} of {cost.commit_count} commits, "
+                f"blamed in {format_timing(before)}"
+            )
+
+    problems = health.problems()
+    for problem in problems:
+        click.secho(f"* {problem}", fg="yellow")
+    if not health.needs_commit_graph:
+        if not problems:
+            click.echo("Nothing to fix.")
+        return
+
+    if not yes and not click.confirm(
+        "Write commit-graph with changed-path Bloom filters?"
+    ):
+        return
+    try:
+        write_commit_graph(repo_path)
+    except subprocess.CalledProcessError as e:
+        raise click.ClickException(
+            "git commit-graph write failed: "
+            + e.stderr.decode("utf-8", errors="replace").strip()
+        )
+    click.echo("Commit-graph written.")
+    if path is not None:
+        after = time_blame(repo_path, path)
+        click.echo(
+            f"{path.name}: blamed in {format_timing(before)} before, "
+            f"{format_timing(after)} now"
+        )
+
+
+def _yes_no(value: bool) -> str:
+    return "yes" if value else "no"
@@ -0,0 +1,145 @@
+"""Inline pane that shows `git show` output for the commit under cursor."""
+
+from __future__ import annotations
+
+from subprocess import CalledProcessError
+
+from prompt_toolkit.application import get_app
+from prompt_toolkit.eventloop import run_in_executor_with_context
+from prompt_toolkit.formatted_text import PygmentsTokens, to_formatted_text
+from prompt_toolkit.formatted_text.utils import split_lines
+from prompt_toolkit.layout import (
+    ConditionalContainer,
+    FormattedTextControl,
+    Window,
+)
+from pygments.lexers.diff import DiffLexer
+
+from .cache import LRUCache
+from .daemon import DaemonError
+from .git_plumbing import STAGING_SHA
+
+from typing import TYPE_CHECKING, Dict, List, Optional, Set
+
+if TYPE_CHECKING:
+    from prompt_toolkit.filters import FilterOrBool
+    from prompt_toolkit.formatted_text import StyleAndTextTuples
+    from .git_plumbing import Git
+
+
+MAX_CACHED_COMMITS = 64
+PLACEHOLDER_STYLE = "#777"
+
+
+def highlight_commit(show_output: str) -> List[StyleAndTextTuples]:
+    """Turn `git show` output into highlighted lines of formatted text."""
+    tokens = DiffLexer().get_tokens(show_output)
+    return list(split_lines(to_formatted_text(PygmentsTokens(tokens))))
+
+
+class CommitDetails:
+    """Fetches commit details in the background and keeps them around.
+
+    Output of `git show` is highlighted once, right after fetching it. Up to
+    `max_entries` highlighted commits are kept in memory, keyed by their SHA.
+    Failures are shown until the commit is requested again, but never cached.
+    """
+
+    def __init__(self, git: Git, max_entries: int = MAX_CACHED_COMMITS):
+        self._git = git
+        self._cache: LRUCache[str, List[StyleAndTextTuples]] = LRUCache(
+            max_entries
+        )
+        self._pending: Set[str] = set()
+        self._failures: Dict[str, List[StyleAndTextTuples]] = {}
+
+    def get(self, sha: str) -> Optional[List[StyleAndTextTuples]]:
+        """Return highlighted lines for `sha`, or None if not fetched yet."""
+        lines = self._cache.get(sha)
+        if lines is None:
+            return self._failures.get(sha)
+        return lines
+
+    def request(self, sha: str):
+        """Schedule fetching details of `sha`, unless it's already known."""
+        if sha in self._pending or sha in self._cache:
+            return
+        self._failures.pop(sha, None)
+        self._pending.add(sha)
+        get_app().create_background_task(self._fetch(sha))
+
+    async def _fetch(self, sha: str):
+        try:
+            output = await run_in_executor_with_context(
+                self._git.show_commit, sha
+            )
+        except (CalledProcessError, DaemonError) as e:
+            message = f"Could not run git show for {sha}: {e}"
+            self._failures[sha] = [[(PLACEHOLDER_STYLE, message)]]
+        else:
+            self._failures.pop(sha, None)
+            self._cache[sha] = highlight_commit(output)
+        finally:
+            self._pending.discard(sha)
+
+        get_app().invalidate()
+
+
+class CommitDetailsPane(ConditionalContainer):
+    """Split pane showing message, stats and diff of the indicated commit."""
+
+    SCROLL_STEP = 5
+
+    def __init__(self, details: CommitDetails, filter: FilterOrBool):
+        self._details = details
+        self._sha: Optional[str] = None
+        self._scroll = 0
+        super().__init__(
+            Window(
+                FormattedTextControl(self._get_text),
+                wrap_lines=False,
+                style="bg:#222",
+            ),
+            filter=filter,
+        )
+
+    @property
+    def sha(self) -> Optional[str]:
+        return self._sha
+
+    @sha.setter
+    def sha(self, sha: Optional[str]):
+        if sha == self._sha:
+            return
+        self._sha = sha
+        self._scroll = 0
+        if sha is not None and sha != STAGING_SHA:
+            self._details.request(sha)
+
+    def scroll_down(self):
+        lines = self._details.get(self._sha) if self._sha else None
+        if lines is not None:
+            last_line = max(len(lines) - 1, 0)
+            self._scroll = min(self._scroll + self.SCROLL_STEP, last_line)
+
+    def scroll_up(self):
+        self._scroll = max(self._scroll - self.SCROLL_STEP, 0)
+
+    def _get_text(self) -> StyleAndTextTuples:
+        if self._sha is None:
+            return [(PLACEHOLDER_STYLE, "(empty file)")]
+        if self._sha == STAGING_SHA:
+            return [(PLACEHOLDER_STYLE, "(Uncommitted changes)")]
+
+        lines = self._details.get(self._sha)
+        if lines is None:
+            return [(PLACEHOLDER_STYLE, f"Loading {self._sha}...")]
+
+        # The pane is never taller than the terminal. Anything below that is
+        # not shown, and on big diffs is way too costly to hand over anyway.
+        height = get_app().output.get_size().rows
+        text: StyleAndTextTuples = []
+        for line in lines[self._scroll : self._scroll + height]:
+            text.extend(line)
+            text.append(("", "\n"))
+        return text
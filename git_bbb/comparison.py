@@ -0,0 +1,306 @@
+"""Comparing blames of a file between two revisions."""
+
+from __future__ import annotations
+
+from array import array
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from prompt_toolkit.buffer import Buffer, Document
+from prompt_toolkit.key_binding import KeyBindings
+from prompt_toolkit.layout import (
+    BufferControl,
+    FormattedTextControl,
+    HSplit,
+    Margin,
+    VSplit,
+    Window,
+)
+from prompt_toolkit.lexers import PygmentsLexer
+from prompt_toolkit.layout.processors import TabsProcessor
+
+from .git_plumbing import STAGING_SHA
+
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence
+
+if TYPE_CHECKING:
+    from pathlib import Path
+    from prompt_toolkit.layout import WindowRenderInfo
+    from prompt_toolkit.formatted_text import StyleAndTextTuples
+    from .git_plumbing import Git, BlameLine, Hunk
+
+
+SHA_CHARS_SHOWN = 8
+UTF_RIGHT_ARROW = "→"
+UTF_HORIZONTAL_BAR = "—"
+
+
+@dataclass
+class ReattributedLine:
+    """Line of the new revision, blamed on a different commit than before.
+
+    Old fields are None for lines that have no counterpart in the old
+    revision.
+    """
+
+    line_number: int
+    old_line_number: Optional[int]
+    old_sha: Optional[str]
+    new_sha: str
+    content: str
+
+
+class BlameComparison:
+    """Lines that changed their attributed commit between two revisions.
+
+    Blames are aligned using the diff between both revisions. Outside of the
+    diff hunks lines map one to one, and lines inside of a hunk are paired by
+    their position in it. SHAs are interned into integer arrays first, so the
+    alignment is a single linear pass of integer comparisons.
+    """
+
+    def __init__(
+        self,
+        old_blame: List[BlameLine],
+        new_blame: List[BlameLine],
+        hunks: Sequence[Hunk],
+    ):
+        self.old_line_count = len(old_blame)
+        self.new_line_count = len(new_blame)
+        self.summaries: Dict[str, str] = {}
+
+        sha_ids: Dict[str, int] = {}
+        self._shas: List[str] = []
+        for blame in (*old_blame, *new_blame):
+            if blame.sha not in sha_ids:
+                sha_ids[blame.sha] = len(self._shas)
+                self._shas.append(blame.sha)
+                self.summaries[blame.sha] = blame.summary
+        old_ids = array("I", (sha_ids[b.sha] for b in old_blame))
+        new_ids = array("I", (sha_ids[b.sha] for b in new_blame))
+
+        self.lines: List[ReattributedLine] = []
+        old_row = new_row = 0
+        for hunk in hunks:
+            # 0-based rows where the hunk begins, see Hunk.
+            old_begin = hunk.old_start - 1 + (hunk.old_count == 0)
+            new_begin = hunk.new_start - 1 + (hunk.new_count == 0)
+            self._compare_rows(
+                old_ids, new_ids, new_blame, old_row, new_row, new_begin
+            )
+            for n in range(hunk.new_count):
+                changed_row = new_begin + n
+                paired_row = old_begin + n if n < hunk.old_count else None
+                if (
+                    paired_row is None
+                    or old_ids[paired_row] != new_ids[changed_row]
+                ):
+                    self._add_line(new_blame, old_ids, paired_row, changed_row)
+            old_row = old_begin + hunk.old_count
+            new_row = new_begin + hunk.new_count
+        self._compare_rows(
+            old_ids, new_ids, new_blame, old_row, new_row, len(new_blame)
+        )
+
+        self.gained = Counter(line.new_sha for line in self.lines)
+        self.lost = Counter(
+            line.old_sha for line in self.lines if line.old_sha is not None
+        )
+
+    def _compare_rows(
+        self,
+        old_ids: array,
+        new_ids: array,
+        new_blame: List[BlameLine],
+        old_row: int,
+        new_row: int,
+        new_end: int,
+    ):
+        """Compare unchanged lines, from given rows up to `new_end`."""
+        offset = old_row - new_row
+        for row in range(new_row, new_end):
+            if old_ids[row + offset] != new_ids[row]:
+                self._add_line(new_blame, old_ids, row + offset, row)
+
+    def _add_line(
+        self,
+        new_blame: List[BlameLine],
+        old_ids: array,
+        old_row: Optional[int],
+        new_row: int,
+    ):
+        blame = new_blame[new_row]
+        has_old_row = old_row is not None
+        self.lines.append(
+            ReattributedLine(
+                line_number=new_row + 1,
+                old_line_number=old_row + 1 if has_old_row else None,
+                old_sha=self._shas[old_ids[old_row]] if has_old_row else None,
+                new_sha=blame.sha,
+                content=blame.content,
+            )
+        )
+
+
+class ComparisonError(ValueError):
+    """Raised when the file can't be compared between given revisions."""
+
+
+def compare_blames(
+    git: Git, path: Path, old_rev: str, new_rev: Optional[str]
+) -> BlameComparison:
+    """Blame `path` in both revisions and compare the results.
+
+    The file is followed across renames, `path` being its path in the newer
+    revision.
+    """
+    old_path = git.find_old_path(old_rev, new_rev, path)
+    if old_path is None:
+        raise ComparisonError(f"{path.name} does not exist in {old_rev}.")
+
+    # Both blames are independent, so there's no need to wait for one
+    # before starting the other.
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        old_blame = executor.submit(git.blame, old_path, old_rev)
+        new_blame = executor.submit(git.blame, path, new_rev)
+        hunks = git.diff_hunks(old_rev, old_path, new_rev, path)
+        return BlameComparison(old_blame.result(), new_blame.result(), hunks)
+
+
+class ComparisonView(HSplit):
+    """Lists lines re-attributed between two revisions, with counts."""
+
+    def __init__(
+        self, git: Git, path: Path, old_rev: str, new_rev: Optional[str]
+    ):
+        self._comparison = compare_blames(git, path, old_rev, new_rev)
+        self._old_rev = old_rev
+        self._new_rev = new_rev if new_rev is not None else "working tree"
+
+        content = "".join(line.content for line in self._comparison.lines)
+        self._buffer = Buffer(read_only=True)
+        self._buffer.set_document(
+            Document(content.rstrip("\n"), cursor_position=0),
+            bypass_readonly=True,
+        )
+        control = BufferControl(
+            self._buffer,
+            lexer=PygmentsLexer.from_filename(str(path)),
+            include_default_input_processors=False,
+            input_processors=[TabsProcessor(char1=" ", char2=" ")],
+            key_bindings=self._bindings(),
+        )
+
+        super().__init__(
+            [
+                Window(FormattedTextControl(self._header), height=1),
+                VSplit(
+                    [
+                        Window(
+                            control,
+                            left_margins=[
+                                ReattributionMargin(self._comparison.lines)
+                            ],
+                            always_hide_cursor=True,
+                        ),
+                        Window(
+                            FormattedTextControl(self._counts),
+                            width=40,
+                            style="bg:#222",
+                        ),
+                    ]
+                ),
+            ]
+        )
+
+    def _header(self) -> StyleAndTextTuples:
+        comparison = self._comparison
+        return [
+            (
+                "#ffe100",
+                f"{self._old_rev} {UTF_RIGHT_ARROW} {self._new_rev}: "
+                f"{len(comparison.lines)} of {comparison.new_line_count} "
+                "lines re-attributed",
+            )
+        ]
+
+    def _counts(self) -> StyleAndTextTuples:
+        comparison = self._comparison
+        text: StyleAndTextTuples = []
+        for counter, sign, style in (
+            (comparison.gained, "+", "#a6e22e"),
+            (comparison.lost, "-", "#f92672"),
+        ):
+            for sha, count in counter.most_common():
+                text.append((style, f"{sign}{count:<5} "))
+                text.append(("#7777ee", _short_sha(sha) + " "))
+                text.append(("", comparison.summaries[sha] + "\n"))
+        return text
+
+    def _bindings(self) -> KeyBindings:
+        kb = KeyBindings()
+
+        @kb.add("q", eager=True)
+        def exit(event):
+            event.app.exit()
+
+        @kb.add("j")
+        @kb.add("down")
+        def cursor_down(event):
+            self._buffer.cursor_down(count=event.arg)
+
+        @kb.add("k")
+        @kb.add("up")
+        def cursor_up(event):
+            self._buffer.cursor_up(count=event.arg)
+
+        @kb.add("g", "g")
+        def go_to_first_line(event):
+            self._buffer.cursor_position = 0
+
+        @kb.add("G")
+        def go_to_last_line(event):
+            self._buffer.cursor_position = len(self._buffer.text)
+
+        return kb
+
+
+def _short_sha(sha: Optional[str]) -> str:
+    if sha is None:
+        return " " * SHA_CHARS_SHOWN
+    if sha == STAGING_SHA:
+        return UTF_HORIZONTAL_BAR * SHA_CHARS_SHOWN
+    return sha[:SHA_CHARS_SHOWN]
+
+
+class ReattributionMargin(Margin):
+    """Shows line number and the old & new commit of every listed line."""
+
+    LINE_NUMBER_WIDTH = 7
+
+    def __init__(self, lines: List[ReattributedLine]):
+        self._lines = lines
+
+    def create_margin(
+        self, winfo: WindowRenderInfo, width: int, height: int
+    ) -> StyleAndTextTuples:
+        current_row = winfo.ui_content.cursor_position.y
+        text: StyleAndTextTuples = []
+        for row in winfo.displayed_lines:
+            if row >= len(self._lines):
+                # Nothing was re-attributed
+                break
+            line = self._lines[row]
+            style = "#ffe100 bold" if row == current_row else ""
+            text += [
+                ("#777", f"{line.line_number:>{self.LINE_NUMBER_WIDTH}}"),
+                (style or "#f92672", _short_sha(line.old_sha)),
+                (style, f" {UTF_RIGHT_ARROW} "),
+                (style or "#a6e22e", _short_sha(line.new_sha) + " \n"),
+            ]
+        return text
+
+    def get_width(self, _) -> int:
+        # Line number, two SHAs, an arrow with spaces and a trailing space
+        return self.LINE_NUMBER_WIDTH + 2 * SHA_CHARS_SHOWN + 4
@@ -0,0 +1,396 @@
+"""Long-lived process that serves git plumbing to many `git bbb` clients.
+
+The daemon owns a single `Git` object, and with it the caches of blames and
+the pool of threads running git. Clients talk to it over a per-repository Unix
+socket, using JSON lines: each request is a `{"method": ..., "args": [...]}`
+object, answered by `{"result": ...}` or `{"error": ...}`.
+"""
+
+import dataclasses
+import hashlib
+import json
+import logging
+import os
+import socket
+import socketserver
+import stat
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import click
+
+from .git_plumbing import Git, BlameLine, Hunk, TraceStop
+
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+IDLE_TIMEOUT = 30 * 60
+IDLE_CHECK_INTERVAL = 10
+SPAWN_TIMEOUT = 5
+SPAWN_POLL_INTERVAL = 0.05
+
+# Methods of Git that clients are allowed to call.
+SERVED_METHODS = {
+    "blame",
+    "show_commit",
+    "diff_hunks",
+    "trace_line",
+    "cat_file",
+    "rev_parse",
+    "find_old_path",
+}
+# Arguments of served methods that are paths, by position.
+PATH_ARGUMENTS = {
+    "blame": (0,),
+    "diff_hunks": (1, 3),
+    "trace_line": (1,),
+    "cat_file": (1,),
+    "find_old_path": (2,),
+}
+SERIALIZED_TYPES = {cls.__name__: cls for cls in (BlameLine, Hunk, TraceStop)}
+# Fields of serialized types that hold paths.
+PATH_FIELDS = {
+    "BlameLine": ("original_filename", "previous_filename"),
+    "TraceStop": ("path",),
+}
+
+
+class DaemonError(Exception):
+    """Raised on the client side when the daemon fails to serve a request."""
+
+
+def socket_path(repo_path: Path, ignore_revs_file: Optional[str]) -> Path:
+    """Path to the socket of the daemon serving given repository.
+
+    Sockets are kept in a directory accessible only to the current user, and
+    named after the repository & ignore-revs file, which both influence the
+    results of blaming. Raises DaemonError if that directory is not safe.
+    """
+    socket_dir = Path(tempfile.gettempdir()) / f"git-bbb-{os.getuid()}"
+    socket_dir.mkdir(mode=0o700, exist_ok=True)
+    # The directory might have been there already, made by someone else in
+    # order to control the sockets in it.
+    dir_stat = socket_dir.lstat()
+    if (
+        not stat.S_ISDIR(dir_stat.st_mode)
+        or dir_stat.st_uid != os.getuid()
+        or dir_stat.st_mode & 0o077
+    ):
+        raise DaemonError(
+            f"Refusing to use {socket_dir}: it has to be a directory owned "
+            "by the current user, and accessible only to them."
+        )
+    key = f"{repo_path}\0{ignore_revs_file}".encode("utf-8")
+    return socket_dir / (hashlib.sha1(key).hexdigest()[:16] + ".sock")
+
+
+def _encode(value: Any) -> Any:
+    if dataclasses.is_dataclass(value):
+        fields = {
+            name: _encode(field)
+            for name, field in dataclasses.asdict(value).items()
+        }
+        return {"__type__": type(value).__name__, **fields}
+    if isinstance(value, Path):
+        return str(value)
+    if isinstance(value, bytes):
+        return {"__bytes__": value.decode("utf-8", errors="surrogateescape")}
+    if isinstance(value, (list, tuple)):
+        return [_encode(v) for v in value]
+    return value
+
+
+def _decode(value: Any) -> Any:
+    if isinstance(value, list):
+        return [_decode(v) for v in value]
+    if isinstance(value, dict) and "__bytes__" in value:
+        return value["__bytes__"].encode("utf-8", errors="surrogateescape")
+    if isinstance(value, dict) and "__type__" in value:
+        type_name = value.pop("__type__")
+        for field in PATH_FIELDS.get(type_name, ()):
+            if value[field] is not None:
+                value[field] = Path(value[field])
+        return SERIALIZED_TYPES[type_name](**value)
+    return value
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    server: "BlameDaemon"
+
+    def handle(self):
+        self.server.connection_opened()
+        try:
+            for line in self.rfile:
+                try:
+                    request = json.loads(line)
+                except ValueError as e:
+                    response = {"error": f"Malformed request: {e}"}
+                else:
+                    response = self.server.dispatch(request)
+                self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+                self.wfile.flush()
+        finally:
+            self.server.connection_closed()
+
+
+class BlameDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Serves calls to a shared `Git` object, shuts down when left idle."""
+
+    daemon_threads = True
+
+    def __init__(self, path: Path, git: Git, idle_timeout: float):
+        self.git = git
+        self.idle_timeout = idle_timeout
+        self._connections = 0
+        self._last_activity = time.monotonic()
+        self._activity_lock = threading.Lock()
+        super().__init__(str(path), _RequestHandler)
+
+    def connection_opened(self):
+        with self._activity_lock:
+            self._connections += 1
+            self._last_activity = time.monotonic()
+
+    def connection_closed(self):
+        with self._activity_lock:
+            self._connections -= 1
+            self._last_activity = time.monotonic()
+
+    def dispatch(self, request: dict) -> dict:
+        with self._activity_lock:
+            self._last_activity = time.monotonic()
+
+        method = request.get("method")
+        if method not in SERVED_METHODS:
+            return {"error": f"Unknown method: {method}"}
+
+        try:
+            args = list(request.get("args", []))
+            for position in PATH_ARGUMENTS.get(method, ()):
+                args[position] = Path(args[position])
+            result = getattr(self.git, method)(*args)
+        except subprocess.CalledProcessError as e:
+            return {
+                "error": str(e),
+                "returncode": e.returncode,
+                "cmd": _encode(e.cmd),
+            }
+        except Exception as e:
+            # Whatever went wrong, the connection has to stay usable for
+            # the next requests of the client.
+            logger.exception("%s failed", method)
+            return {"error": f"{type(e).__name__}: {e}"}
+        return {"result": _encode(result)}
+
+    def is_idle(self) -> bool:
+        with self._activity_lock:
+            idle_for = time.monotonic() - self._last_activity
+            return self._connections == 0 and idle_for > self.idle_timeout
+
+    def serve_until_idle(self):
+        def shut_down_when_idle():
+            while not self.is_idle():
+                time.sleep(min(IDLE_CHECK_INTERVAL, self.idle_timeout))
+            self.shutdown()
+
+        threading.Thread(target=shut_down_when_idle, daemon=True).start()
+        try:
+            self.serve_forever()
+        finally:
+            self.server_close()
+            os.unlink(self.server_address)
+
+
+class RemoteGit:
+    """Stand-in for `Git` that forwards calls to a running daemon.
+
+    If the daemon fails to answer, calls fall back to a local `Git` for the
+    rest of the session.
+    """
+
+    def __init__(self, path: Path, repo_path: Path, ignore_revs_file):
+        self.repo_path = repo_path
+        self.ignore_revs_file = ignore_revs_file
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.connect(str(path))
+        self._file = self._socket.makefile("rwb")
+        # Calls come from the UI thread and from executor threads alike.
+        self._lock = threading.Lock()
+        self._local_git: Optional[Git] = None
+
+    def _call(self, method: str, *args) -> Any:
+        if self._local_git is None:
+            try:
+                return self._call_daemon(method, *args)
+            except DaemonError:
+                with self._lock:
+                    if self._local_git is None:
+                        self._local_git = Git(self.ignore_revs_file)
+        return getattr(self._local_git, method)(*args)
+
+    def _call_daemon(self, method: str, *args) -> Any:
+        request = {"method": method, "args": _encode(args)}
+        with self._lock:
+            try:
+                self._file.write(json.dumps(request).encode("utf-8") + b"\n")
+                self._file.flush()
+                line = self._file.readline()
+            except OSError as e:
+                raise DaemonError(f"Lost git-bbb daemon: {e}") from e
+        if not line:
+            raise DaemonError("Connection to git-bbb daemon was closed.")
+
+        response = json.loads(line)
+        if "returncode" in response:
+            # Keep the failures of git the same as when running it locally
+            raise subprocess.CalledProcessError(
+                response["returncode"], response["cmd"]
+            )
+        if "error" in response:
+            raise DaemonError(response["error"])
+        return _decode(response["result"])
+
+    def blame(
+        self,
+        path,
+        rev,
+        line_ranges=(),
+        ignore_revs=frozenset(),
+        reverse_until=None,
+    ):
+        return self._call(
+            "blame", path, rev, line_ranges, sorted(ignore_revs), reverse_until
+        )
+
+    def show_commit(self, sha):
+        return self._call("show_commit", sha)
+
+    def diff_hunks(self, old_rev, old_path, new_rev, new_path):
+        return self._call("diff_hunks", old_rev, old_path, new_rev, new_path)
+
+    def trace_line(self, rev, path, line_number):
+        return self._call("trace_line", rev, path, line_number)
+
+    def rev_parse(self, rev):
+        return self._call("rev_parse", rev)
+
+    def find_old_path(self, old_rev, new_rev, new_path):
+        old_path = self._call("find_old_path", old_rev, new_rev, new_path)
+        return Path(old_path) if old_path is not None else None
+
+    def cat_file(self, rev, path):
+        return self._call("cat_file", rev, path)
+
+
+def attach(ignore_revs_file: Optional[str]) -> Optional[RemoteGit]:
+    """Connect to the daemon of current repository, spawning it if needed.
+
+    Returns None if the daemon could not be reached.
+    """
+    repo_path = Git.show_toplevel()
+    if ignore_revs_file is not None:
+        # Daemon runs in the repository root, not in the current directory,
+        # and the socket has to be the same no matter where it's called from.
+        ignore_revs_file = str(Path(ignore_revs_file).resolve())
+    else:
+        ignore_revs_file = (
+            Git.configured_ignore_revs() or Git.default_ignore_revs()
+        )
+    try:
+        path = socket_path(repo_path, ignore_revs_file)
+    except DaemonError as e:
+        logger.warning("%s Not using the daemon.", e)
+        return None
+
+    try:
+        return RemoteGit(path, repo_path, ignore_revs_file)
+    except OSError:
+        pass
+
+    cmd = [sys.executable, "-m", "git_bbb.daemon"]
+    if ignore_revs_file is not None:
+        cmd += ["--ignore-revs-file", ignore_revs_file]
+    # Kept in an anonymous file rather than a pipe, so that a long-running
+    # daemon never blocks on writing to it.
+    with tempfile.TemporaryFile() as stderr:
+        daemon = subprocess.Popen(
+            cmd,
+            cwd=repo_path,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=stderr,
+            start_new_session=True,
+        )
+
+        deadline = time.monotonic() + SPAWN_TIMEOUT
+        while time.monotonic() < deadline:
+            try:
+                return RemoteGit(path, repo_path, ignore_revs_file)
+            except OSError:
+                if daemon.poll() is not None:
+                    stderr.seek(0)
+                    output = stderr.read().decode("utf-8", errors="replace")
+                    logger.warning(
+                        "git-bbb daemon exited with code %s, "
+                        "not using the daemon:\n%s",
+                        daemon.returncode,
+                        output.strip(),
+                    )
+                    return None
+                time.sleep(SPAWN_POLL_INTERVAL)
+    logger.warning(
+        "git-bbb daemon did not start within %s seconds. "
+        "Not using the daemon.",
+        SPAWN_TIMEOUT,
+    )
+    return None
+
+
+@click.command()
+@click.option(
+    "--ignore-revs-file",
+    default=None,
+    type=click.Path(exists=True, readable=True, dir_okay=False),
+)
+@click.option(
+    "--idle-timeout",
+    default=IDLE_TIMEOUT,
+    show_default=True,
+    help="Seconds without any clients after which the daemon exits.",
+)
+@click.option(
+    "--max-cached-lines",
+    default=None,
+    type=int,
+    help="Upper bound on the number of blamed lines kept in memory.",
+)
+def main(ignore_revs_file, idle_timeout, max_cached_lines):
+    kwargs = {}
+    if max_cached_lines is not None:
+        kwargs["max_cached_blame_lines"] = max_cached_lines
+    git = Git(ignore_revs_file, **kwargs)
+
+    try:
+        path = socket_path(git.repo_path, git.ignore_revs_file)
+    except DaemonError as e:
+        sys.exit(str(e))
+    try:
+        # Remove the leftover of a daemon that died without cleaning up.
+        socket.socket(socket.AF_UNIX).connect(str(path))
+    except ConnectionRefusedError:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+    else:
+        sys.exit(f"git-bbb daemon is already running at {path}")
+
+    BlameDaemon(path, git, idle_timeout).serve_until_idle()
+
+
+if __name__ == "__main__":
+    main()
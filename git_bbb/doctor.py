@@ -0,0 +1,428 @@
+"""Checking whether the repository is set up for blaming files quickly.
+
+`git blame` walks the history of the blamed file. Without a commit-graph, git
+has to parse every commit it visits, and without changed-path Bloom filters
+in it, it has to diff trees of every commit just to find out whether the file
+was touched at all. Both are written by `git commit-graph write`.
+"""
+
+from __future__ import annotations
+
+import mmap
+import struct
+import subprocess
+import time
+from bisect import bisect_left
+from dataclasses import dataclass
+from pathlib import Path
+
+from prompt_toolkit.application import get_app
+from prompt_toolkit.eventloop import run_in_executor_with_context
+from prompt_toolkit.filters import Condition
+from prompt_toolkit.layout import (
+    ConditionalContainer,
+    FormattedTextControl,
+    Window,
+)
+
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from prompt_toolkit.formatted_text import StyleAndTextTuples
+
+
+COMMIT_GRAPH_SIGNATURE = b"CGPH"
+COMMIT_GRAPH_HEADER = struct.Struct(">4sBBBB")
+COMMIT_GRAPH_CHUNK_ENTRY = struct.Struct(">4sQ")
+OID_FANOUT_CHUNK = b"OIDF"
+OID_LOOKUP_CHUNK = b"OIDL"
+BLOOM_INDEXES_CHUNK = b"BIDX"
+BLOOM_DATA_CHUNK = b"BDAT"
+# Lengths of object IDs, by the hash version in commit-graph header.
+HASH_LENGTHS = {1: 20, 2: 32}
+
+# Below this size of packed objects, blaming is quick regardless of the
+# commit-graph, so there's no point in nagging about it in the browser.
+SLOW_REPOSITORY_PACK_SIZE = 64 * 1024 * 1024
+WRITE_COMMIT_GRAPH_CMD = [
+    "git",
+    "commit-graph",
+    "write",
+    "--reachable",
+    "--changed-paths",
+]
+WARNING_STYLE = "#ff8700"
+ERROR_STYLE = "#ff5f5f"
+PLACEHOLDER_STYLE = "#777"
+
+
+class CommitGraphFile:
+    """Single commit-graph file, or one layer of a commit-graph chain.
+
+    Only the chunk table and the object ID chunks are read, see
+    Documentation/gitformat-commit-graph.txt in git sources.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            header = COMMIT_GRAPH_HEADER.unpack_from(self._data, 0)
+        except struct.error:
+            raise ValueError(f"Truncated commit-graph: {path}") from None
+        signature, _version, hash_version, chunk_count, _ = header
+        if signature != COMMIT_GRAPH_SIGNATURE:
+            raise ValueError(f"Not a commit-graph: {path}")
+        if hash_version not in HASH_LENGTHS:
+            raise ValueError(f"Unknown hash version in commit-graph: {path}")
+        self._hash_length = HASH_LENGTHS[hash_version]
+
+        self._chunks: Dict[bytes, int] = {}
+        for n in range(chunk_count):
+            chunk_id, offset = COMMIT_GRAPH_CHUNK_ENTRY.unpack_from(
+                self._data,
+                COMMIT_GRAPH_HEADER.size + n * COMMIT_GRAPH_CHUNK_ENTRY.size,
+            )
+            self._chunks[chunk_id] = offset
+        if OID_FANOUT_CHUNK not in self._chunks:
+            raise ValueError(f"Commit-graph without OID fanout: {path}")
+        if OID_LOOKUP_CHUNK not in self._chunks:
+            raise ValueError(f"Commit-graph without OID lookup: {path}")
+
+        self._fanout = struct.unpack_from(
+            ">256I", self._data, self._chunks[OID_FANOUT_CHUNK]
+        )
+
+    @property
+    def commit_count(self) -> int:
+        return self._fanout[-1]
+
+    @property
+    def has_bloom_filters(self) -> bool:
+        return (
+            BLOOM_INDEXES_CHUNK in self._chunks
+            and BLOOM_DATA_CHUNK in self._chunks
+        )
+
+    def __contains__(self, sha: str) -> bool:
+        oid = bytes.fromhex(sha)
+        if len(oid) != self._hash_length:
+            return False
+
+        # The fanout narrows the search down to commits with the same first
+        # byte, the rest is a binary search over the sorted lookup chunk.
+        begin = self._fanout[oid[0] - 1] if oid[0] else 0
+        end = self._fanout[oid[0]]
+        lookup = self._chunks[OID_LOOKUP_CHUNK]
+        oids = _OIDView(self._data, lookup, self._hash_length)
+        idx = bisect_left(oids, oid, begin, end)
+        return idx < end and oids[idx] == oid
+
+    def close(self):
+        self._data.close()
+
+
+class _OIDView:
+    """Sequence of object IDs stored one after another in a buffer."""
+
+    def __init__(self, data: mmap.mmap, offset: int, hash_length: int):
+        self._data = data
+        self._offset = offset
+        self._hash_length = hash_length
+
+    def __getitem__(self, idx: int) -> bytes:
+        start = self._offset + idx * self._hash_length
+        return self._data[start : start + self._hash_length]
+
+
+@dataclass
+class RepositoryHealth:
+    """State of the structures that make blaming fast."""
+
+    repo_path: Path
+    commit_graph_layers: int
+    commit_graph_commits: int
+    has_bloom_filters: bool
+    head_in_commit_graph: bool
+    has_multi_pack_index: bool
+    pack_count: int
+    pack_size: int
+    commit_graph_error: Optional[str] = None
+
+    @property
+    def has_commit_graph(self) -> bool:
+        return self.commit_graph_layers > 0
+
+    @property
+    def needs_commit_graph(self) -> bool:
+        """True if writing the commit-graph would speed up blaming."""
+        return not (
+            self.has_commit_graph
+            and self.has_bloom_filters
+            and self.head_in_commit_graph
+        )
+
+    @property
+    def is_slow(self) -> bool:
+        """True if the repository is big enough for blames to be slow."""
+        return (
+            self.needs_commit_graph
+            and self.pack_size >= SLOW_REPOSITORY_PACK_SIZE
+        )
+
+    def problems(self) -> List[str]:
+        """Human readable descriptions of what slows blaming down."""
+        problems = []
+        if self.commit_graph_error is not None:
+            problems.append(
+                f"Commit-graph is unreadable: {self.commit_graph_error}"
+            )
+        elif not self.has_commit_graph:
+            problems.append("There is no commit-graph.")
+        else:
+            if not self.has_bloom_filters:
+                problems.append(
+                    "Commit-graph has no changed-path Bloom filters."
+                )
+            if not self.head_in_commit_graph:
+                problems.append("Commit-graph does not contain HEAD.")
+        if self.pack_count > 1 and not self.has_multi_pack_index:
+            problems.append(
+                f"Objects are spread over {self.pack_count} packs, without "
+                "a multi-pack-index."
+            )
+        return problems
+
+
+def _git_output(repo_path: Path, *args: str) -> str:
+    cmd = ["git", *args]
+    return subprocess.check_output(cmd, cwd=repo_path).decode("utf-8").strip()
+
+
+def _commit_graph_paths(objects_path: Path) -> List[Path]:
+    """Paths of commit-graph files, in the order git would read them."""
+    info_path = objects_path / "info"
+    single_file = info_path / "commit-graph"
+    if single_file.is_file():
+        return [single_file]
+
+    chain_dir = info_path / "commit-graphs"
+    try:
+        chain = (chain_dir / "commit-graph-chain").read_text().split()
+    except FileNotFoundError:
+        return []
+    return [chain_dir / f"graph-{layer}.graph" for layer in chain]
+
+
+def probe(repo_path: Path) -> RepositoryHealth:
+    """Inspect the object store of the repository.
+
+    Only reads a few files and runs git twice, so it's cheap enough to do
+    before every start of the browser.
+    """
+    objects_path = repo_path / _git_output(
+        repo_path, "rev-parse", "--git-path", "objects"
+    )
+    try:
+        head = _git_output(repo_path, "rev-parse", "--verify", "-q", "HEAD")
+    except subprocess.CalledProcessError:
+        # No commits yet
+        head = None
+
+    layers: List[CommitGraphFile] = []
+    error = None
+    try:
+        for path in _commit_graph_paths(objects_path):
+            layers.append(CommitGraphFile(path))
+    except (OSError, ValueError) as e:
+        error = str(e)
+
+    try:
+        packs = list((objects_path / "pack").glob("*.pack"))
+        health = RepositoryHealth(
+            repo_path=repo_path,
+            commit_graph_layers=len(layers),
+            commit_graph_commits=sum(layer.commit_count for layer in layers),
+            has_bloom_filters=(
+                bool(layers)
+                and all(layer.has_bloom_filters for layer in layers)
+            ),
+            head_in_commit_graph=(
+                head is None or any(head in layer for layer in layers)
+            ),
+            has_multi_pack_index=(
+                objects_path / "pack" / "multi-pack-index"
+            ).is_file(),
+            pack_count=len(packs),
+            pack_size=sum(pack.stat().st_size for pack in packs),
+            commit_graph_error=error,
+        )
+    finally:
+        for layer in layers:
+            layer.close()
+    return health
+
+
+@dataclass
+class BlameCostEstimate:
+    """How much history has to be walked to blame a file."""
+
+    line_count: int
+    commit_count: int
+    file_commit_count: int
+
+
+def estimate_blame_cost(repo_path: Path, path: Path) -> BlameCostEstimate:
+    """Count lines of `path` at HEAD, and commits `git blame` would visit.
+
+    Counting commits that touched the file walks the history the same way
+    blaming it does, so this is as slow as the repository is.
+    """
+    contents = subprocess.check_output(
+        ["git", "cat-file", "blob", f"HEAD:{_repo_relative(repo_path, path)}"],
+        cwd=repo_path,
+    )
+    return BlameCostEstimate(
+        line_count=contents.count(b"\n"),
+        commit_count=int(
+            _git_output(repo_path, "rev-list", "--count", "HEAD")
+        ),
+        file_commit_count=int(
+            _git_output(
+                repo_path, "rev-list", "--count", "HEAD", "--", str(path)
+            )
+        ),
+    )
+
+
+def _repo_relative(repo_path: Path, path: Path) -> Path:
+    if path.is_absolute():
+        return path.relative_to(repo_path)
+    return path
+
+
+def time_blame(repo_path: Path, path: Path) -> Optional[float]:
+    """Measure how long blaming `path` at HEAD takes, in seconds.
+
+    Returns None if the file can't be blamed at HEAD, e.g. when it's not
+    committed yet.
+    """
+    cmd = ["git", "blame", "--porcelain", "HEAD", "--", str(path)]
+    start = time.perf_counter()
+    result = subprocess.run(
+        cmd,
+        cwd=repo_path,
+        # Same as for the blames of the browser
+        env={"HOME": ""},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    if result.returncode != 0:
+        return None
+    return time.perf_counter() - start
+
+
+def write_commit_graph(repo_path: Path):
+    """Write commit-graph of all reachable commits, with Bloom filters."""
+    subprocess.run(
+        WRITE_COMMIT_GRAPH_CMD,
+        cwd=repo_path,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        check=True,
+    )
+
+
+def format_timing(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "n/a"
+    if seconds < 1:
+        return f"{seconds * 1000:.0f}ms"
+    return f"{seconds:.2f}s"
+
+
+class DoctorNotice(ConditionalContainer):
+    """Status line warning about slow blames, offering to fix them.
+
+    Shown only if the startup probe found the repository to be slow to blame.
+    Writing the commit-graph is done in the background, with blame of the
+    browsed file timed before & after it.
+    """
+
+    def __init__(self, health: Optional[RepositoryHealth], path: Path):
+        self._health = health
+        self._path = path
+        self._running = False
+        self._message: StyleAndTextTuples = []
+        if health is not None and health.is_slow:
+            self._message = [
+                (WARNING_STYLE, "Blames may be slow: "),
+                (WARNING_STYLE, " ".join(health.problems())),
+                (PLACEHOLDER_STYLE, " W: write commit-graph, w: dismiss"),
+            ]
+        self._fixable = bool(self._message)
+
+        super().__init__(
+            Window(
+                FormattedTextControl(lambda: self._message),
+                height=1,
+                style="bg:#333",
+            ),
+            filter=Condition(lambda: bool(self._message)),
+        )
+
+    @property
+    def fixable(self) -> bool:
+        """True if the notice waits for consent to write the commit-graph."""
+        return self._fixable
+
+    @property
+    def dismissable(self) -> bool:
+        return bool(self._message) and not self._running
+
+    def dismiss(self):
+        self._fixable = False
+        self._message = []
+
+    def fix(self):
+        """Write the commit-graph in the background, timing blame around it."""
+        if not self._fixable or self._health is None:
+            return
+        self._fixable = False
+        self._running = True
+        self._message = [
+            (PLACEHOLDER_STYLE, "Writing commit-graph in the background...")
+        ]
+        get_app().create_background_task(self._fix(self._health.repo_path))
+
+    async def _fix(self, repo_path: Path):
+        try:
+            before = await run_in_executor_with_context(
+                time_blame, repo_path, self._path
+            )
+            await run_in_executor_with_context(write_commit_graph, repo_path)
+            after = await run_in_executor_with_context(
+                time_blame, repo_path, self._path
+            )
+        except subprocess.CalledProcessError as e:
+            stderr = e.stderr.decode("utf-8", errors="replace").strip()
+            self._message = [
+                (ERROR_STYLE, f"Writing commit-graph failed: {stderr}"),
+                (PLACEHOLDER_STYLE, " w: dismiss"),
+            ]
+        else:
+            self._message = [
+                ("#a6e22e", "Commit-graph written. "),
+                (
+                    "",
+                    f"Blame of {self._path.name} at HEAD took "
+                    f"{format_timing(before)} before, "
+                    f"{format_timing(after)} now.",
+                ),
+                (PLACEHOLDER_STYLE, " w: dismiss"),
+            ]
+        finally:
+            self._running = False
+        get_app().invalidate()
@@ -4,19 +4,24 @@ Blame-related functionality is done by us instead of gitpython, becase the
 latter doesn't have all of the necessary functionality.
 """
 
-import os
 import re
 import subprocess
+import tempfile
 from dataclasses import dataclass
-from typing import Optional, List
+from typing import AbstractSet, FrozenSet, Optional, List, Sequence, Tuple
 from pathlib import Path
 
 import git
 import git.cmd
 
+from .cache import LRUCache
+
 
 DEFAULT_IGNORE_REVS_PATH = Path(".git-ignore-revs")
 STAGING_SHA = "0" * 40
+MAX_CACHED_BLAMES = 128
+MAX_CACHED_BLAME_LINES = 500_000
+FULL_SHA_REGEX = re.compile(r"[0-9a-f]{40}")
 BLAME_HEADER_REGEX = re.compile(
     r"(?P<sha>[a-z0-9]{40})"
     r" "
@@ -42,6 +47,16 @@ BLAME_HEADER_REGEX = re.compile(
     r"filename (?P<original_filename>.*)\n"
     r"\t(?P<content>.*\n)"
 )
+HUNK_HEADER_REGEX = re.compile(
+    r"^@@ -(?P<old_start>\d+)(,(?P<old_count>\d+))?"
+    r" \+(?P<new_start>\d+)(,(?P<new_count>\d+))? @@",
+    re.MULTILINE,
+)
+LINE_LOG_RECORD_SEPARATOR = "\x00"
+LINE_LOG_FIELD_SEPARATOR = "\x1f"
+# Separators have to be passed as placeholders, git arguments can't hold NULs
+LINE_LOG_FORMAT = "%x00" + "%x1f".join(["%H", "%an", "%at", "%s"])
+LINE_LOG_NEW_PATH_REGEX = re.compile(r"^\+\+\+ b/(?P<path>.*)$", re.MULTILINE)
 
 
 @dataclass
@@ -94,8 +109,88 @@ class BlameLine:
         return BlameLine(**fields)
 
 
+@dataclass
+class Hunk:
+    """Lines changed between two versions of a file, as in `git diff -U0`.
+
+    A count of 0 means that lines were only added (or only removed), in which
+    case the start points to the line _after which_ the change happened.
+    """
+
+    old_start: int
+    old_count: int
+    new_start: int
+    new_count: int
+
+    @classmethod
+    def from_groupdict(cls, **fields):
+        return Hunk(
+            old_start=int(fields["old_start"]),
+            old_count=int(fields["old_count"] or 1),
+            new_start=int(fields["new_start"]),
+            new_count=int(fields["new_count"] or 1),
+        )
+
+
+@dataclass
+class TraceStop:
+    """Revision in which a traced line was changed, as seen by `git log -L`."""
+
+    sha: str
+    path: Path
+    line_number: int
+
+    author_name: str
+    author_time: int
+    summary: str
+
+    @classmethod
+    def from_log_record(cls, record: str) -> Optional["TraceStop"]:
+        header, _, diff = record.partition("\n")
+        sha, author_name, author_time, summary = header.split(
+            LINE_LOG_FIELD_SEPARATOR, 3
+        )
+        path_match = LINE_LOG_NEW_PATH_REGEX.search(diff)
+        hunk_match = HUNK_HEADER_REGEX.search(diff)
+        if path_match is None or hunk_match is None:
+            return None
+
+        hunk = Hunk.from_groupdict(**hunk_match.groupdict())
+        hunk_body = diff[hunk_match.end() :].split("\n")[1:]
+        return TraceStop(
+            sha=sha,
+            path=Path(path_match["path"]),
+            line_number=cls._added_line_number(hunk, hunk_body),
+            author_name=author_name,
+            author_time=int(author_time),
+            summary=summary,
+        )
+
+    @staticmethod
+    def _added_line_number(hunk: Hunk, hunk_body: List[str]) -> int:
+        """Line number of the first added line of the hunk.
+
+        Hunks of `git log -L` may begin with context lines, or with the lines
+        removed by the commit, so the traced line is not always the first one.
+        """
+        line_number = hunk.new_start
+        for line in hunk_body:
+            if line.startswith("+"):
+                return line_number
+            if line.startswith(" "):
+                line_number += 1
+            elif not line.startswith(("-", "\\")):
+                # End of the hunk, without anything added
+                break
+        return hunk.new_start
+
+
 class Git:
-    def __init__(self, ignore_revs_file: Optional[str] = None):
+    def __init__(
+        self,
+        ignore_revs_file: Optional[str] = None,
+        max_cached_blame_lines: int = MAX_CACHED_BLAME_LINES,
+    ):
         if ignore_revs_file is None:
             ignore_revs_file = self.configured_ignore_revs()
         if ignore_revs_file is None:
@@ -105,6 +200,12 @@ class Git:
 
         self.repo_path = self.show_toplevel()
 
+        self._blame_cache: LRUCache[tuple, List[BlameLine]] = LRUCache(
+            MAX_CACHED_BLAMES,
+            max_weight=max_cached_blame_lines,
+            weigh=len,
+        )
+
     @staticmethod
     def default_ignore_revs() -> Optional[str]:
         """Return the path to default ignore-revs file, if available."""
@@ -146,28 +247,35 @@ class Git:
             return None
         return str(configured_file_path)
 
-    def show(self, rev: Optional[str]):
-        cmd = ["git", "show"]
-        env = os.environ.copy()
-        # FIXME: Delta will set Less with --quit-on-eof by default
-        #
-        # This behavior would have to be sidestepped by implementing .gitconfig
-        # settings for git-bbb, so that one can specify a pager for git-bbb
-        # separately to git-show:
-        #
-        #     [pager]
-        #         show = delta
-        #         bbb = delta --paging=always
-        #
-        # This could also be achieved if Delta took options by an environment
-        # variable. It is preferrable, but (? most likely ?) so not implemented
-        # in Delta yet.
-        env["DELTA_PAGER"] = "less -+F"
-        if rev:
-            cmd += [rev]
-        subprocess.run(cmd, env=env)
-
-    def blame(self, path: Path, rev: Optional[str]) -> List[BlameLine]:
+    def show_commit(self, sha: str) -> str:
+        """Return message, diffstat and patch of a commit, as `git show` would.
+
+        Output is not colored and no external diff tools or pagers are used -
+        it is meant to be highlighted and displayed by us.
+        """
+        cmd = [
+            "git",
+            "show",
+            "--no-color",
+            "--no-ext-diff",
+            "--format=fuller",
+            "--stat",
+            "--patch",
+            sha,
+            "--",
+        ]
+        return subprocess.check_output(cmd, cwd=self.repo_path).decode(
+            "utf-8", errors="replace"
+        )
+
+    def blame(
+        self,
+        path: Path,
+        rev: Optional[str],
+        line_ranges: Sequence[Tuple[int, int]] = (),
+        ignore_revs: AbstractSet[str] = frozenset(),
+        reverse_until: Optional[str] = None,
+    ) -> List[BlameLine]:
         """Run git blame.
 
         Global configuration will be discarded except for
@@ -181,18 +289,47 @@ class Git:
         If revision is equal to STAGING_SHA, i.e. is a string of zeroes,
         currently staged changes are removed by setting rev to the one that the
         current HEAD points to.
+
+        If `line_ranges` are given, only lines within these 1-based, inclusive
+        ranges are blamed.
+
+        Revisions in `ignore_revs` are ignored in addition to the ones from
+        the ignore-revs file.
+
+        With `reverse_until`, runs reverse blame over the range from `rev` to
+        `reverse_until`: lines of `rev` are blamed on the last revision of the
+        range they were still present in.
+
+        Results are cached per set of ignored revisions, for full commit SHAs
+        and for the working tree as long as neither the file nor HEAD change.
         """
         if not path.is_absolute():
             path = (self.repo_path / path).resolve()
 
-        if rev == STAGING_SHA:
+        line_ranges = tuple((start, end) for start, end in line_ranges)
+        ignore_revs = frozenset(ignore_revs)
+        cache_key = self._blame_cache_key(
+            path, rev, line_ranges, ignore_revs, reverse_until
+        )
+        if cache_key is not None:
+            cached = self._blame_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        if rev == STAGING_SHA or (rev is None and reverse_until is not None):
             # Get rid of unstaged changes.
             rev = self.rev_parse_head()
 
         cmd = ["git", "blame", "--line-porcelain"]
         if self.ignore_revs_file is not None:
             cmd += ["--ignore-revs-file", self.ignore_revs_file]
-        if rev is not None:
+        for ignored_rev in sorted(ignore_revs):
+            cmd += ["--ignore-rev", ignored_rev]
+        for start, end in line_ranges:
+            cmd += ["-L", f"{start},{end}"]
+        if reverse_until is not None:
+            cmd += ["--reverse", f"{rev}..{reverse_until}", "--"]
+        elif rev is not None:
             cmd += [rev, "--"]
         cmd += [str(path)]
 
@@ -206,13 +343,195 @@ class Git:
             for m in BLAME_HEADER_REGEX.finditer(blame_output)
         ]
 
+        if cache_key is not None:
+            self._blame_cache[cache_key] = blames
         return blames
 
-    def show_toplevel(self):
+    def _blame_cache_key(
+        self,
+        path: Path,
+        rev: Optional[str],
+        line_ranges: Tuple[Tuple[int, int], ...],
+        ignore_revs: FrozenSet[str],
+        reverse_until: Optional[str],
+    ) -> Optional[tuple]:
+        """Key under which a blame can be cached, or None if it can't be."""
+        if reverse_until is not None:
+            range_revs = (rev or "", reverse_until)
+            if rev == STAGING_SHA or not all(
+                FULL_SHA_REGEX.fullmatch(r) for r in range_revs
+            ):
+                return None
+            version = ("reverse", *range_revs)
+        elif rev is None:
+            # Uncommitted lines depend both on the file and on what HEAD is.
+            try:
+                stat = path.stat()
+                head = self.rev_parse_head()
+            except (OSError, subprocess.CalledProcessError):
+                return None
+            version = ("worktree", head, stat.st_mtime_ns, stat.st_size)
+        elif rev != STAGING_SHA and FULL_SHA_REGEX.fullmatch(rev):
+            version = ("commit", rev)
+        else:
+            # Symbolic revs like branch names can point elsewhere any time.
+            return None
+
+        return (version, path, line_ranges, ignore_revs)
+
+    def diff_hunks(
+        self,
+        old_rev: Optional[str],
+        old_path: Path,
+        new_rev: Optional[str],
+        new_path: Path,
+    ) -> List[Hunk]:
+        """Get hunks that turn one version of a file into another one.
+
+        Revisions follow the semantics of `blame`: None means the working tree,
+        and STAGING_SHA means HEAD.
+        """
+        if old_rev == STAGING_SHA:
+            old_rev = "HEAD"
+        if new_rev == STAGING_SHA:
+            new_rev = "HEAD"
+
+        if old_rev is None and new_rev is None:
+            return []
+        elif old_rev is None:
+            return [
+                Hunk(h.new_start, h.new_count, h.old_start, h.old_count)
+                for h in self.diff_hunks(new_rev, new_path, None, old_path)
+            ]
+
+        # Prevents Git from reading global config
+        env = {"HOME": ""}
+        cmd = ["git", "diff", "-U0", "--no-color", "--no-ext-diff"]
+
+        if new_rev is None:
+            # Git can't compare a blob with a working tree file under a
+            # different path, so the blob has to be written out first.
+            with tempfile.NamedTemporaryFile() as old_file:
+                old_file.write(self.cat_file(old_rev, old_path))
+                old_file.flush()
+                cmd += ["--no-index", old_file.name, str(new_path)]
+                # --no-index exits with 1 if the files differ
+                diff_output = subprocess.run(
+                    cmd,
+                    env=env,
+                    cwd=self.repo_path,
+                    stdout=subprocess.PIPE,
+                ).stdout
+        else:
+            cmd += [
+                f"{old_rev}:{self._repo_relative(old_path)}",
+                f"{new_rev}:{self._repo_relative(new_path)}",
+            ]
+            diff_output = subprocess.check_output(
+                cmd, env=env, cwd=self.repo_path
+            )
+
+        return [
+            Hunk.from_groupdict(**m.groupdict())
+            for m in HUNK_HEADER_REGEX.finditer(
+                diff_output.decode("utf-8", errors="replace")
+            )
+        ]
+
+    def find_old_path(
+        self, old_rev: str, new_rev: Optional[str], new_path: Path
+    ) -> Optional[Path]:
+        """Get the path `new_path` had in `old_rev`, following renames.
+
+        None for `new_rev` means the working tree. Returns None if the file
+        did not exist in `old_rev`.
+        """
+        cmd = ["git", "diff", "-M", "--name-status", "-z", old_rev]
+        if new_rev is not None:
+            cmd += [new_rev]
+        cmd += ["--"]
+
+        # Prevents Git from reading global config
+        env = {"HOME": ""}
+        diff_output = subprocess.check_output(
+            cmd, env=env, cwd=self.repo_path
+        ).decode("utf-8", errors="surrogateescape")
+
+        new_path = self._repo_relative(new_path)
+        fields = iter(diff_output.split("\0"))
+        for status in fields:
+            if status.startswith("R"):
+                old, new = next(fields), next(fields)
+            elif status:
+                old = new = next(fields)
+            else:
+                continue
+            if Path(new) != new_path:
+                continue
+            if status == "A":
+                return None
+            return self.repo_path / old
+        # Unchanged between both revisions
+        return self.repo_path / new_path
+
+    def trace_line(
+        self, rev: str, path: Path, line_number: int
+    ) -> List[TraceStop]:
+        """Find revisions that changed a line, newest first.
+
+        Uses a single `git log -L`, which follows the line across renames.
+        """
+        if rev == STAGING_SHA:
+            rev = "HEAD"
+
+        cmd = [
+            "git",
+            "log",
+            "--no-color",
+            "--no-ext-diff",
+            f"--format={LINE_LOG_FORMAT}",
+            f"-L{line_number},{line_number}:{self._repo_relative(path)}",
+            rev,
+            "--",
+        ]
+
+        # Prevents Git from reading global config
+        env = {"HOME": ""}
+
+        log_output = subprocess.check_output(
+            cmd, env=env, cwd=self.repo_path
+        ).decode("utf-8", errors="replace")
+        stops = [
+            TraceStop.from_log_record(record)
+            for record in log_output.split(LINE_LOG_RECORD_SEPARATOR)[1:]
+        ]
+        return [stop for stop in stops if stop is not None]
+
+    def cat_file(self, rev: str, path: Path) -> bytes:
+        """Get contents of the file under `path`, as of `rev`."""
+        cmd = ["git", "cat-file", "blob", f"{rev}:{self._repo_relative(path)}"]
+        return subprocess.check_output(cmd, cwd=self.repo_path)
+
+    def _repo_relative(self, path: Path) -> Path:
+        if path.is_absolute():
+            return path.relative_to(self.repo_path)
+        return path
+
+    @staticmethod
+    def show_toplevel():
         """Get absolute path to the repository we're in currently."""
         cmd = ["git", "rev-parse", "--show-toplevel"]
         return Path(subprocess.check_output(cmd).decode("utf-8").strip())
 
+    def rev_parse(self, rev: str) -> str:
+        """Get the SHA of the commit that `rev` points to."""
+        cmd = ["git", "rev-parse", "--verify", f"{rev}^{{commit}}"]
+        return (
+            subprocess.check_output(cmd, cwd=self.repo_path)
+            .decode("utf-8")
+            .strip()
+        )
+
     def rev_parse_head(self) -> str:
         """Get current commit SHA.
 
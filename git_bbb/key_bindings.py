@@ -76,8 +76,60 @@ def generate_bindings(browser) -> KeyBindings:
         browser.redo()
 
     @kb.add("S")
-    def use_git_show(event):
-        browser.run_git_show_for_line()
+    def toggle_commit_details(event):
+        browser.toggle_commit_details()
+
+    @kb.add("}")
+    def scroll_commit_details_down(event):
+        browser.scroll_commit_details_down()
+
+    @kb.add("{")
+    def scroll_commit_details_up(event):
+        browser.scroll_commit_details_up()
+
+    @kb.add("R")
+    def toggle_reverse(event):
+        browser.toggle_reverse()
+
+    @kb.add("I")
+    def toggle_ignore_current_sha(event):
+        browser.toggle_ignore_current_sha()
+
+    @kb.add("g", "i")
+    def unignore_last_ignored_rev(event):
+        browser.unignore_last_ignored_rev()
+
+    @kb.add("g", "I")
+    def clear_ignored_revs(event):
+        browser.clear_ignored_revs()
+
+    @kb.add("M")
+    def start_metadata_search(event):
+        browser.start_metadata_search()
+
+    metadata_search_active = Condition(lambda: browser.metadata_search_active)
+
+    @kb.add("n", filter=metadata_search_active)
+    def next_metadata_match(event):
+        browser.next_metadata_match()
+
+    @kb.add("N", filter=metadata_search_active)
+    def previous_metadata_match(event):
+        browser.previous_metadata_match()
+
+    # Vi bindings use T as a prefix of the "till backward" motion, which would
+    # otherwise delay this one and swallow the key pressed right after it.
+    @kb.add("T", eager=True)
+    def toggle_line_trace(event):
+        browser.toggle_line_trace()
+
+    @kb.add("(")
+    def older_trace_stop(event):
+        browser.warp_to_older_trace_stop()
+
+    @kb.add(")")
+    def newer_trace_stop(event):
+        browser.warp_to_newer_trace_stop()
 
     @kb.add("J")
     def next_line_of_this_sha(event):
@@ -98,3 +150,14 @@ def generate_bindings(browser) -> KeyBindings:
         browser.go_to_first_line_of_current_sha()
 
     return kb
+
+
+def generate_metadata_query_bindings(browser) -> KeyBindings:
+    kb = KeyBindings()
+
+    @kb.add("escape", eager=True)
+    @kb.add("c-c")
+    def cancel(event):
+        browser.cancel_metadata_search()
+
+    return kb
@@ -0,0 +1,119 @@
+"""Translating line numbers between revisions of a file."""
+
+from __future__ import annotations
+
+from bisect import bisect_right
+
+from .cache import LRUCache
+from .git_plumbing import FULL_SHA_REGEX, STAGING_SHA
+
+from typing import TYPE_CHECKING, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    from pathlib import Path
+    from .git_plumbing import Git, Hunk
+
+
+MAX_CACHED_LINE_MAPS = 256
+
+FileVersion = Tuple[Optional[str], "Path"]
+
+
+class LineMap:
+    """Line translation table between two versions of a file.
+
+    Built from `git diff -U0` hunks. Lines outside of the hunks are moved by
+    the offset accumulated from the preceding hunks. Lines changed by a hunk
+    are clamped into the lines that replaced them, so that the cursor lands
+    as close as possible to what was there before. Lines that were removed
+    altogether land on the line preceding them, which exists even if they
+    were at the end of the file.
+    """
+
+    def __init__(self, hunks: Sequence[Hunk]):
+        # Hunks that only add/remove lines have their start pointing to the
+        # line before the change. Normalize everything into half-open ranges
+        # [begin, end) of affected lines.
+        self._old_begins: List[int] = []
+        self._old_ends: List[int] = []
+        self._new_begins: List[int] = []
+        self._new_ends: List[int] = []
+        for hunk in hunks:
+            old_begin = hunk.old_start + (hunk.old_count == 0)
+            new_begin = hunk.new_start + (hunk.new_count == 0)
+            self._old_begins.append(old_begin)
+            self._old_ends.append(old_begin + hunk.old_count)
+            self._new_begins.append(new_begin)
+            self._new_ends.append(new_begin + hunk.new_count)
+
+    def translate(self, lineno: int, reverse: bool = False) -> int:
+        """Map line number from the old version to the new one.
+
+        With `reverse`, maps from the new version to the old one instead.
+        """
+        if reverse:
+            src_begins, src_ends = self._new_begins, self._new_ends
+            dst_begins, dst_ends = self._old_begins, self._old_ends
+        else:
+            src_begins, src_ends = self._old_begins, self._old_ends
+            dst_begins, dst_ends = self._new_begins, self._new_ends
+
+        idx = bisect_right(src_begins, lineno) - 1
+        if idx < 0:
+            return lineno
+
+        if lineno < src_ends[idx]:
+            # Line changed by the hunk.
+            dst_last = dst_ends[idx] - 1
+            return min(dst_begins[idx] + lineno - src_begins[idx], dst_last)
+
+        return lineno + dst_ends[idx] - src_ends[idx]
+
+
+class LineMapper:
+    """Computes and caches line maps between pairs of file versions.
+
+    A file version is a (rev, path) pair, with revs following the semantics
+    of `Git.blame`. Maps are symmetric, so translating in the opposite
+    direction reuses the already computed one. Only maps between commits
+    given by their full SHAs are cached, as the working tree and symbolic
+    revs can change at any time.
+    """
+
+    def __init__(self, git: Git, max_entries: int = MAX_CACHED_LINE_MAPS):
+        self._git = git
+        self._cache: LRUCache[
+            Tuple[FileVersion, FileVersion], LineMap
+        ] = LRUCache(max_entries)
+
+    def line_map(self, old: FileVersion, new: FileVersion) -> LineMap:
+        line_map = self._cache.get((old, new))
+        if line_map is None:
+            line_map = LineMap(self._git.diff_hunks(*old, *new))
+            if _is_immutable(old) and _is_immutable(new):
+                self._cache[(old, new)] = line_map
+        return line_map
+
+    def translate(
+        self, lineno: int, src: FileVersion, dst: FileVersion
+    ) -> int:
+        """Map line number in `src` version to the one in `dst`."""
+        if src == dst:
+            return lineno
+
+        reverse_map = self._cache.get((dst, src))
+        if reverse_map is not None:
+            translated = reverse_map.translate(lineno, reverse=True)
+        else:
+            translated = self.line_map(src, dst).translate(lineno)
+
+        return max(translated, 1)
+
+
+def _is_immutable(version: FileVersion) -> bool:
+    rev, _ = version
+    return (
+        rev is not None
+        and rev != STAGING_SHA
+        and FULL_SHA_REGEX.fullmatch(rev) is not None
+    )
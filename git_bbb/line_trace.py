@@ -0,0 +1,128 @@
+"""Timeline of revisions in which a single line was changed."""
+
+from __future__ import annotations
+
+from datetime import datetime
+from subprocess import CalledProcessError
+
+from prompt_toolkit.application import get_app
+from prompt_toolkit.eventloop import run_in_executor_with_context
+from prompt_toolkit.filters import Condition
+from prompt_toolkit.layout import (
+    ConditionalContainer,
+    Dimension,
+    FormattedTextControl,
+    Window,
+)
+
+from .daemon import DaemonError
+
+from typing import TYPE_CHECKING, List, Optional
+
+if TYPE_CHECKING:
+    from pathlib import Path
+    from prompt_toolkit.formatted_text import StyleAndTextTuples
+    from .git_plumbing import Git, TraceStop
+
+
+MAX_TIMELINE_HEIGHT = 8
+SHA_CHARS_SHOWN = 12
+PLACEHOLDER_STYLE = "#777"
+SELECTED_STYLE = "#ffe100 bold"
+
+
+class LineTracePane(ConditionalContainer):
+    """Navigable list of revisions that changed the traced line.
+
+    The whole trace is computed with one `git log -L` run in the background.
+    Stops are ordered from the newest to the oldest one.
+    """
+
+    def __init__(self, git: Git):
+        self._git = git
+        self.visible = False
+        self._stops: Optional[List[TraceStop]] = None
+        self._error: Optional[str] = None
+        self._selected = 0
+        self._generation = 0
+        super().__init__(
+            Window(
+                FormattedTextControl(self._get_text),
+                height=Dimension(max=MAX_TIMELINE_HEIGHT),
+                wrap_lines=False,
+                style="bg:#222",
+            ),
+            filter=Condition(lambda: self.visible),
+        )
+
+    def trace(self, rev: str, path: Path, line_number: int):
+        """Start tracing a line, replacing previous timeline."""
+        self.visible = True
+        self._stops = None
+        self._error = None
+        self._selected = 0
+        self._generation += 1
+        get_app().create_background_task(
+            self._fetch(self._generation, rev, path, line_number)
+        )
+
+    async def _fetch(
+        self, generation: int, rev: str, path: Path, line_number: int
+    ):
+        try:
+            stops = await run_in_executor_with_context(
+                self._git.trace_line, rev, path, line_number
+            )
+        except (CalledProcessError, DaemonError) as e:
+            stops, error = [], f"Could not trace the line: {e}"
+        else:
+            error = None
+
+        # A newer trace might have been started in the meantime
+        if generation != self._generation:
+            return
+
+        self._stops = stops
+        self._error = error
+        get_app().invalidate()
+
+    def select_older(self) -> Optional[TraceStop]:
+        """Move selection one stop back in history, return that stop."""
+        if not self._stops:
+            return None
+        self._selected = min(self._selected + 1, len(self._stops) - 1)
+        return self._stops[self._selected]
+
+    def select_newer(self) -> Optional[TraceStop]:
+        """Move selection one stop forward in history, return that stop."""
+        if not self._stops:
+            return None
+        self._selected = max(self._selected - 1, 0)
+        return self._stops[self._selected]
+
+    def _get_text(self) -> StyleAndTextTuples:
+        if self._error is not None:
+            return [(PLACEHOLDER_STYLE, self._error)]
+        if self._stops is None:
+            return [(PLACEHOLDER_STYLE, "Tracing line...")]
+        if not self._stops:
+            return [(PLACEHOLDER_STYLE, "(no history for this line)")]
+
+        text: StyleAndTextTuples = []
+        for n, stop in enumerate(self._stops):
+            date = datetime.fromtimestamp(stop.author_time).strftime(
+                "%Y-%m-%d"
+            )
+            style = SELECTED_STYLE if n == self._selected else ""
+            if n == self._selected:
+                # Keeps the selected stop visible when the list is long.
+                text.append(("[SetCursorPosition]", ""))
+            text.append(
+                (
+                    style,
+                    f"{stop.sha[:SHA_CHARS_SHOWN]} {date} "
+                    f"{stop.path}:{stop.line_number} "
+                    f"{stop.author_name}: {stop.summary}\n",
+                )
+            )
+        return text
@@ -0,0 +1,181 @@
+"""Browsing multiple files in one session."""
+
+from __future__ import annotations
+
+from prompt_toolkit.application import get_app
+from prompt_toolkit.filters import Condition
+from prompt_toolkit.key_binding import KeyBindings
+from prompt_toolkit.layout import (
+    ConditionalContainer,
+    DynamicContainer,
+    FormattedTextControl,
+    HSplit,
+    Window,
+)
+
+from .browser import Browser
+from .commit_details import CommitDetails
+from .doctor import DoctorNotice
+from .line_mapping import LineMapper
+
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from pathlib import Path
+    from prompt_toolkit.formatted_text import StyleAndTextTuples
+    from .browser import WarpTarget
+    from .doctor import RepositoryHealth
+    from .git_plumbing import Git
+
+
+class Tabs(HSplit):
+    """Browsers in tabs, sharing git plumbing and caches with each other.
+
+    Every tab has its own undo/redo history. The tab bar is shown only when
+    there is more than one tab.
+
+    If `health` of the repository says that blames are going to be slow, a
+    notice offering to fix that is shown below the tabs.
+    """
+
+    def __init__(
+        self,
+        git: Git,
+        rev: str,
+        path: Path,
+        initial_lineno: int,
+        health: Optional[RepositoryHealth] = None,
+    ):
+        self._git = git
+        self._line_mapper = LineMapper(git)
+        self._commit_details = CommitDetails(git)
+        self._browsers: List[Browser] = [
+            self._new_browser(rev, path, initial_lineno)
+        ]
+        self._current = 0
+        self._doctor_notice = DoctorNotice(health, path)
+
+        super().__init__(
+            [
+                ConditionalContainer(
+                    Window(FormattedTextControl(self._tab_bar), height=1),
+                    filter=Condition(lambda: len(self._browsers) > 1),
+                ),
+                DynamicContainer(lambda: self.current),
+                self._doctor_notice,
+            ],
+            key_bindings=self._bindings(),
+        )
+
+    @property
+    def current(self) -> Browser:
+        return self._browsers[self._current]
+
+    def _new_browser(
+        self,
+        rev: str,
+        path: Path,
+        lineno: int,
+        ignored_revs: Tuple[str, ...] = (),
+        reverse_until: Optional[str] = None,
+    ) -> Browser:
+        return Browser(
+            self._git,
+            rev,
+            path,
+            lineno,
+            line_mapper=self._line_mapper,
+            commit_details=self._commit_details,
+            ignored_revs=ignored_revs,
+            reverse_until=reverse_until,
+        )
+
+    def open(self, target: WarpTarget):
+        """Open a new tab right after the current one, and switch to it.
+
+        The new tab blames in the same direction, and ignores the same revs,
+        as the current one - same as warping within the current tab would.
+        """
+        browser = self._new_browser(
+            *target,
+            ignored_revs=self.current.ignored_revs,
+            reverse_until=self.current.reverse_until,
+        )
+        self._browsers.insert(self._current + 1, browser)
+        self._switch_to(self._current + 1)
+
+    def close_current(self):
+        """Close current tab, unless it's the only one left."""
+        if len(self._browsers) == 1:
+            return
+        self._browsers.pop(self._current).close()
+        self._switch_to(min(self._current, len(self._browsers) - 1))
+
+    def close(self):
+        """Close all of the tabs, e.g. when the application exits."""
+        for browser in self._browsers:
+            browser.close()
+
+    def next(self):
+        self._switch_to((self._current + 1) % len(self._browsers))
+
+    def previous(self):
+        self._switch_to((self._current - 1) % len(self._browsers))
+
+    def _switch_to(self, index: int):
+        self._current = index
+        layout = get_app().layout
+        # Parents of the containers are otherwise only known after the next
+        # render, and until then the bindings of tabs would not be found.
+        layout.update_parents_relations()
+        layout.focus(self.current)
+
+    def _tab_bar(self) -> StyleAndTextTuples:
+        text: StyleAndTextTuples = []
+        for n, browser in enumerate(self._browsers):
+            style = "bg:#555 #ffe100 bold" if n == self._current else "#aaa"
+            text.append((style, f" {n + 1}: {browser.title} "))
+            text.append(("", " "))
+        return text
+
+    def _bindings(self) -> KeyBindings:
+        kb = KeyBindings()
+        # Bindings of a container are active also when one of the prompts of
+        # the browser has focus, so letters typed there have to be let through.
+        browsing = Condition(lambda: self.current.source_has_focus())
+
+        @kb.add("o", filter=browsing)
+        def open_line_origin(event):
+            target = self.current.warp_target()
+            if target is not None:
+                self.open(target)
+
+        @kb.add("O", filter=browsing)
+        def open_line_parent(event):
+            target = self.current.previous_warp_target()
+            if target is not None:
+                self.open(target)
+
+        @kb.add("g", "t", filter=browsing)
+        def next_tab(event):
+            self.next()
+
+        @kb.add("g", "T", filter=browsing)
+        def previous_tab(event):
+            self.previous()
+
+        @kb.add("Q", filter=browsing)
+        def close_tab(event):
+            self.close_current()
+
+        notice = self._doctor_notice
+
+        @kb.add("W", filter=browsing & Condition(lambda: notice.fixable))
+        def write_commit_graph(event):
+            notice.fix()
+
+        @kb.add("w", filter=browsing & Condition(lambda: notice.dismissable))
+        def dismiss_doctor_notice(event):
+            notice.dismiss()
+
+        return kb
@@ -5,7 +5,10 @@ from collections import namedtuple
 from typing import Optional
 
 
-RevBrowseInfo = namedtuple("RevBrowseInfo", ["rev", "file_path"])
+# reverse_until is the end of the range browsed with reverse blame, if any.
+RevBrowseInfo = namedtuple(
+    "RevBrowseInfo", ["rev", "file_path", "reverse_until"], defaults=[None]
+)
 
 
 # todo: unittest
@@ -42,8 +45,11 @@ class RevStack:
 
     def do(self, rev_info: RevBrowseInfo):
         """Add rev to the stack after current position, remove undone revs."""
-        # Skip if we haven't changed revs
-        if rev_info.rev == self.current.rev:
+        # Skip if we haven't changed revs, nor the direction of blaming
+        if (
+            rev_info.rev == self.current.rev
+            and rev_info.reverse_until == self.current.reverse_until
+        ):
             return
 
         self.stack_pointer += 1
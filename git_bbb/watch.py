@@ -0,0 +1,229 @@
+"""Following changes made to the browsed file in the working tree."""
+
+from __future__ import annotations
+
+import asyncio
+import ctypes
+import ctypes.util
+import dataclasses
+import os
+import struct
+import sys
+from difflib import SequenceMatcher
+
+from typing import TYPE_CHECKING, Callable, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from pathlib import Path
+    from .git_plumbing import BlameLine
+
+
+POLL_INTERVAL = 0.5
+DEBOUNCE_DELAY = 0.1
+# Above this fraction of changed lines, blaming the whole file is cheaper than
+# telling git to blame many separate ranges.
+FULL_REBLAME_RATIO = 0.5
+
+# From <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+INOTIFY_EVENT_HEADER = struct.Struct("iIII")
+
+
+class FileWatcher:
+    """Calls `on_change` whenever the file at `path` is modified.
+
+    Uses inotify where available, and falls back to polling file stats
+    otherwise. The directory is watched instead of the file itself, because
+    many editors save by replacing the file with a new one.
+    """
+
+    def __init__(self, path: Path, on_change: Callable[[], None]):
+        self.path = path
+        self._on_change = on_change
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._inotify_fd: Optional[int] = None
+        self._poll_task: Optional[asyncio.Task] = None
+        self._debounce_handle: Optional[asyncio.TimerHandle] = None
+
+    def start(self):
+        """Start watching. Has to be called with the event loop running."""
+        self._inotify_fd = self._inotify_init()
+        self._loop = loop = asyncio.get_running_loop()
+        if self._inotify_fd is not None:
+            loop.add_reader(self._inotify_fd, self._read_inotify_events)
+        else:
+            self._poll_task = loop.create_task(self._poll())
+
+    def stop(self):
+        """Stop watching, and release the inotify descriptor if there's one.
+
+        No more changes are reported afterwards, including the ones that were
+        still being debounced.
+        """
+        if self._debounce_handle is not None:
+            self._debounce_handle.cancel()
+            self._debounce_handle = None
+        if self._poll_task is not None:
+            self._poll_task.cancel()
+            self._poll_task = None
+        if self._inotify_fd is not None:
+            # Loop might be gone already, and its readers with it.
+            if not self._loop.is_closed():
+                self._loop.remove_reader(self._inotify_fd)
+            os.close(self._inotify_fd)
+            self._inotify_fd = None
+
+    def _inotify_init(self) -> Optional[int]:
+        if not sys.platform.startswith("linux"):
+            return None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        except (OSError, AttributeError):
+            return None
+        if fd < 0:
+            return None
+
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        directory = os.fsencode(self.path.parent)
+        if libc.inotify_add_watch(fd, directory, mask) < 0:
+            os.close(fd)
+            return None
+        return fd
+
+    def _read_inotify_events(self):
+        try:
+            data = os.read(self._inotify_fd, 64 * 1024)
+        except BlockingIOError:
+            return
+
+        file_name = os.fsencode(self.path.name)
+        offset = 0
+        while offset < len(data):
+            _, _, _, name_length = INOTIFY_EVENT_HEADER.unpack_from(
+                data, offset
+            )
+            offset += INOTIFY_EVENT_HEADER.size
+            name = data[offset : offset + name_length].rstrip(b"\0")
+            offset += name_length
+            if name == file_name:
+                self._schedule_change()
+
+    async def _poll(self):
+        last_stat = self._stat()
+        while True:
+            await asyncio.sleep(POLL_INTERVAL)
+            stat = self._stat()
+            if stat != last_stat:
+                last_stat = stat
+                self._schedule_change()
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = self.path.stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _schedule_change(self):
+        # Saving a file often fires a burst of events, react only once.
+        if self._debounce_handle is not None:
+            self._debounce_handle.cancel()
+        self._debounce_handle = asyncio.get_running_loop().call_later(
+            DEBOUNCE_DELAY, self._on_change
+        )
+
+
+class BlamePatch:
+    """Difference between blamed lines and a new content of the file.
+
+    Figures out which lines of the new content need to be blamed again, and
+    reuses blame information of the lines that didn't change.
+    """
+
+    def __init__(self, old_blames: List[BlameLine], new_lines: List[str]):
+        self._old_blames = old_blames
+        self._new_line_count = len(new_lines)
+        old_lines = [b.content for b in old_blames]
+
+        # Trimming common prefix & suffix keeps the matcher cheap for the
+        # usual case of a single edited region in a large file.
+        prefix = 0
+        max_prefix = min(len(old_lines), len(new_lines))
+        while prefix < max_prefix and old_lines[prefix] == new_lines[prefix]:
+            prefix += 1
+        suffix = 0
+        max_suffix = max_prefix - prefix
+        while (
+            suffix < max_suffix
+            and old_lines[-suffix - 1] == new_lines[-suffix - 1]
+        ):
+            suffix += 1
+
+        matcher = SequenceMatcher(
+            None,
+            old_lines[prefix : len(old_lines) - suffix],
+            new_lines[prefix : len(new_lines) - suffix],
+            autojunk=False,
+        )
+        self.opcodes = [("equal", 0, prefix, 0, prefix)]
+        self.opcodes += [
+            (tag, i1 + prefix, i2 + prefix, j1 + prefix, j2 + prefix)
+            for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+        ]
+        self.opcodes.append(
+            (
+                "equal",
+                len(old_lines) - suffix,
+                len(old_lines),
+                len(new_lines) - suffix,
+                len(new_lines),
+            )
+        )
+
+    @property
+    def changed_line_ranges(self) -> List[Tuple[int, int]]:
+        """1-based, inclusive ranges of new lines that need to be blamed."""
+        return [
+            (j1 + 1, j2)
+            for tag, _, _, j1, j2 in self.opcodes
+            if tag in ("replace", "insert")
+        ]
+
+    @property
+    def needs_full_reblame(self) -> bool:
+        ranges = self.changed_line_ranges
+        changed = sum(end - start + 1 for start, end in ranges)
+        return changed > self._new_line_count * FULL_REBLAME_RATIO
+
+    def apply(self, new_blames: List[BlameLine]) -> List[BlameLine]:
+        """Merge blames of the changed lines with the ones kept from before."""
+        new_blames_by_line = {b.final_line_number: b for b in new_blames}
+        patched = []
+        for tag, i1, i2, j1, j2 in self.opcodes:
+            if tag == "equal":
+                patched += [
+                    dataclasses.replace(
+                        self._old_blames[i], final_line_number=j1 + n + 1
+                    )
+                    for n, i in enumerate(range(i1, i2))
+                ]
+            elif tag in ("replace", "insert"):
+                patched += [new_blames_by_line[j + 1] for j in range(j1, j2)]
+        return patched
+
+    def translate_row(self, row: int) -> int:
+        """Map a row index in the old blame onto the patched one.
+
+        Rows that were removed land on the row preceding them, or on the
+        first one if there's none.
+        """
+        for _, i1, i2, j1, j2 in self.opcodes:
+            if i1 <= row < i2:
+                return max(min(j1 + row - i1, j2 - 1), 0)
+        return min(row, max(self._new_line_count - 1, 0))
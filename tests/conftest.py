@@ -0,0 +1,105 @@
+import asyncio
+import subprocess
+from pathlib import Path
+
+import pytest
+from prompt_toolkit.application import create_app_session
+from prompt_toolkit.input import create_pipe_input
+from prompt_toolkit.output import DummyOutput
+
+from git_bbb import create_application
+from git_bbb.git_plumbing import BlameLine
+
+# Time given to the application to handle all of the keys before it's closed
+SETTLE_TIME = 0.5
+
+
+class Repo:
+    """Git repository in a temporary directory, for tests to commit into."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.git("init", "-q")
+
+    def git(self, *args: str) -> str:
+        return subprocess.check_output(
+            ["git", *args], cwd=self.path, text=True
+        ).strip()
+
+    def commit(self, file_name: str, content: str, message: str) -> str:
+        """Write `content` to the file and commit it, returning the SHA."""
+        (self.path / file_name).write_text(content)
+        self.git("add", file_name)
+        self.git("commit", "-q", "-m", message)
+        return self.git("rev-parse", "HEAD")
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    for variable in ("AUTHOR", "COMMITTER"):
+        monkeypatch.setenv(f"GIT_{variable}_NAME", "Tester")
+        monkeypatch.setenv(f"GIT_{variable}_EMAIL", "tester@example.com")
+    monkeypatch.chdir(tmp_path)
+    return Repo(tmp_path)
+
+
+@pytest.fixture
+def blamed_file(repo):
+    repo.commit("file.py", "a = 1\nb = 2\n", "Initial")
+    repo.commit("file.py", "a = 1\nb = 3\n", "Change b")
+    return repo.path / "file.py"
+
+
+@pytest.fixture
+def run_with_keys():
+    def run_with_keys(path, keys, **options):
+        """Run the browser headless with given keys typed, return its tabs."""
+        with create_pipe_input() as pipe_input:
+            with create_app_session(input=pipe_input, output=DummyOutput()):
+                app = create_application(path, None, None, **options)
+                app.pre_run_callables.append(
+                    lambda: asyncio.get_running_loop().call_later(
+                        SETTLE_TIME, app.exit
+                    )
+                )
+                pipe_input.send_text(keys)
+                app.run()
+        return app.layout.container
+
+    return run_with_keys
+
+
+def _blame_line(sha: str, content: str, line_number: int) -> BlameLine:
+    """Blame of a line, with everything not identifying it made up."""
+    return BlameLine(
+        content=content,
+        sha=sha,
+        summary=f"Summary of {sha}",
+        is_boundary=False,
+        previous_sha=None,
+        previous_filename=None,
+        repeats=None,
+        original_filename=Path("file.txt"),
+        original_line_number=line_number,
+        final_line_number=line_number,
+        author_name="Tester",
+        author_mail="<tester@example.com>",
+        author_time=1600000000,
+        author_tz="+0000",
+        committer_name="Tester",
+        committer_mail="<tester@example.com>",
+        committer_time=1600000000,
+        committer_tz="+0000",
+    )
+
+
+@pytest.fixture
+def make_blame():
+    def make_blame(shas, contents):
+        """Blame lines of `contents`, given by SHA for each of them."""
+        return [
+            _blame_line(sha, content, n + 1)
+            for n, (sha, content) in enumerate(zip(shas, contents))
+        ]
+
+    return make_blame
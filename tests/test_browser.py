@@ -0,0 +1,35 @@
+def statusbar_text(browser):
+    return "".join(text for _, text in browser._statusbar.text)
+
+
+def test_metadata_query_without_matches_shows_in_statusbar(
+    run_with_keys, blamed_file
+):
+    tabs = run_with_keys(blamed_file, "Mauthor:nobody\r")
+    assert "[author:nobody: 0/0]" in statusbar_text(tabs.current)
+
+
+def test_metadata_query_matching_current_line_shows_in_statusbar(
+    run_with_keys, blamed_file
+):
+    tabs = run_with_keys(blamed_file, "Msummary:Initial\r")
+    assert tabs.current.current_line == 0
+    assert "[summary:Initial: 1/1]" in statusbar_text(tabs.current)
+
+
+def test_gi_stops_ignoring_the_last_ignored_rev(repo, run_with_keys):
+    initial = repo.commit("file.py", "a = 1\nb = 2\n", "Initial")
+    change_a = repo.commit("file.py", "a = 2\nb = 2\n", "Change a")
+    change_b = repo.commit("file.py", "a = 2\nb = 3\n", "Change b")
+
+    tabs = run_with_keys(repo.path / "file.py", "Ij")
+    assert tabs.current.ignored_revs == (change_a,)
+    assert tabs.current._shas == [initial, change_b]
+
+    tabs = run_with_keys(repo.path / "file.py", "IjIgi")
+    assert tabs.current.ignored_revs == (change_a,)
+    assert tabs.current._shas == [initial, change_b]
+
+    tabs = run_with_keys(repo.path / "file.py", "IjIgigi")
+    assert tabs.current.ignored_revs == ()
+    assert tabs.current._shas == [change_a, change_b]
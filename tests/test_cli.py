@@ -0,0 +1,30 @@
+from click.testing import CliRunner
+
+from git_bbb import cli
+
+
+def test_doctor_checks_the_repository(repo):
+    repo.commit("file.txt", "a\n", "Initial")
+
+    result = CliRunner().invoke(cli.git_bbb, ["--doctor", "--yes"])
+
+    assert result.exit_code == 0, result.output
+    assert "Commit-graph:" in result.output
+
+
+def test_file_named_doctor_is_browsed(repo, monkeypatch):
+    repo.commit("doctor", "a\n", "Initial")
+    runs = []
+    monkeypatch.setattr(cli, "run", lambda path, *args: runs.append(path))
+
+    result = CliRunner().invoke(cli.git_bbb, ["doctor"])
+
+    assert result.exit_code == 0, result.output
+    assert runs == [repo.path / "doctor"]
+
+
+def test_file_is_required_for_browsing(repo):
+    result = CliRunner().invoke(cli.git_bbb, [])
+
+    assert result.exit_code != 0
+    assert "Missing argument 'file'" in result.output
@@ -0,0 +1,68 @@
+import asyncio
+from subprocess import CalledProcessError
+
+from prompt_toolkit.application import create_app_session
+from prompt_toolkit.output import DummyOutput
+
+from git_bbb.commit_details import (
+    CommitDetails,
+    CommitDetailsPane,
+    highlight_commit,
+)
+from git_bbb.daemon import DaemonError
+
+
+class KnownDetails:
+    def __init__(self, lines):
+        self._lines = lines
+
+    def get(self, sha):
+        return self._lines
+
+    def request(self, sha):
+        pass
+
+
+def test_pane_renders_only_rows_that_fit_the_screen():
+    output = DummyOutput()
+    show_output = "".join(f"+line {n}\n" for n in range(100_000))
+    pane = CommitDetailsPane(KnownDetails(highlight_commit(show_output)), True)
+    pane.sha = "a" * 40
+    pane.scroll_down()
+
+    with create_app_session(output=output):
+        text = pane._get_text()
+
+    rows = "".join(fragment[1] for fragment in text).splitlines()
+    assert len(rows) == output.get_size().rows
+    assert rows[0] == f"+line {CommitDetailsPane.SCROLL_STEP}"
+
+
+class FlakyGit:
+    def __init__(self, *errors):
+        self._errors = list(errors)
+
+    def show_commit(self, sha):
+        if self._errors:
+            raise self._errors.pop(0)
+        return f"commit {sha}\n"
+
+
+def fetch(details, sha):
+    with create_app_session(output=DummyOutput()):
+        asyncio.run(details._fetch(sha))
+
+
+def test_failures_are_shown_but_not_cached():
+    sha = "a" * 40
+    details = CommitDetails(
+        FlakyGit(CalledProcessError(128, "git"), DaemonError("lost"))
+    )
+
+    fetch(details, sha)
+    assert "Could not run git show" in details.get(sha)[0][0][1]
+    fetch(details, sha)
+    assert "lost" in details.get(sha)[0][0][1]
+
+    fetch(details, sha)
+    assert "".join(text for _, text in details.get(sha)[0]) == f"commit {sha}"
@@ -0,0 +1,97 @@
+import pytest
+
+from git_bbb.comparison import (
+    BlameComparison,
+    ComparisonError,
+    ReattributedLine,
+    compare_blames,
+)
+from git_bbb.git_plumbing import Git, Hunk
+
+
+def compare(make_blame, old_shas, new_shas, hunks):
+    old_blame = make_blame(old_shas, [f"old {n}\n" for n in range(9)])
+    new_blame = make_blame(new_shas, [f"new {n}\n" for n in range(9)])
+    return BlameComparison(old_blame, new_blame, hunks)
+
+
+def test_same_line_count_on_both_sides(make_blame):
+    # Line 2 rewritten by commit C, and line 4 reattributed to it, e.g. by
+    # ignoring a revision, with no change to its content.
+    comparison = compare(make_blame, "AABA", "ACBC", [Hunk(2, 1, 2, 1)])
+
+    assert comparison.lines == [
+        ReattributedLine(2, 2, "A", "C", "new 1\n"),
+        ReattributedLine(4, 4, "A", "C", "new 3\n"),
+    ]
+    assert comparison.gained == {"C": 2}
+    assert comparison.lost == {"A": 2}
+
+
+def test_lines_inserted_in_the_middle_have_no_old_counterpart(make_blame):
+    comparison = compare(make_blame, "AB", "ACCB", [Hunk(1, 0, 2, 2)])
+
+    assert comparison.lines == [
+        ReattributedLine(2, None, None, "C", "new 1\n"),
+        ReattributedLine(3, None, None, "C", "new 2\n"),
+    ]
+    assert comparison.lost == {}
+
+
+def test_lines_removed_in_the_middle_are_skipped(make_blame):
+    comparison = compare(make_blame, "ABBA", "AA", [Hunk(2, 2, 1, 0)])
+    assert comparison.lines == []
+
+
+def test_hunk_replacing_more_lines_than_it_adds(make_blame):
+    comparison = compare(make_blame, "ABBBA", "ACA", [Hunk(2, 3, 2, 1)])
+    assert comparison.lines == [ReattributedLine(2, 2, "B", "C", "new 1\n")]
+
+
+def test_hunk_adding_more_lines_than_it_replaces(make_blame):
+    comparison = compare(make_blame, "ABA", "ABCA", [Hunk(2, 1, 2, 2)])
+    assert comparison.lines == [
+        ReattributedLine(3, None, None, "C", "new 2\n")
+    ]
+
+
+@pytest.mark.parametrize(
+    "old_shas, new_shas, hunks, expected",
+    [
+        # Lines added at the end
+        ("AA", "AACC", [Hunk(2, 0, 3, 2)], [(3, None), (4, None)]),
+        # Lines removed from the end
+        ("AABB", "AA", [Hunk(3, 2, 2, 0)], []),
+        # Lines added at the beginning
+        ("AA", "CAA", [Hunk(0, 0, 1, 1)], [(1, None)]),
+        # Lines removed from the beginning, line after them reattributed
+        ("BAA", "CA", [Hunk(1, 1, 0, 0)], [(1, 2)]),
+    ],
+)
+def test_hunks_at_the_edges_of_the_file(
+    make_blame, old_shas, new_shas, hunks, expected
+):
+    comparison = compare(make_blame, old_shas, new_shas, hunks)
+    assert [
+        (line.line_number, line.old_line_number) for line in comparison.lines
+    ] == expected
+
+
+def test_compare_blames_follows_renames(repo):
+    first = repo.commit("old.txt", "a\nb\n", "First")
+    repo.git("mv", "old.txt", "new.txt")
+    repo.commit("new.txt", "a\nB\n", "Rename and change")
+
+    comparison = compare_blames(Git(), repo.path / "new.txt", first, None)
+
+    assert [(line.line_number, line.old_sha) for line in comparison.lines] == [
+        (2, first)
+    ]
+
+
+def test_compare_blames_of_file_added_later(repo):
+    first = repo.commit("old.txt", "a\n", "First")
+    repo.commit("new.txt", "b\n", "Second")
+
+    with pytest.raises(ComparisonError):
+        compare_blames(Git(), repo.path / "new.txt", first, None)
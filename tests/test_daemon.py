@@ -0,0 +1,63 @@
+import threading
+
+import pytest
+
+from git_bbb.daemon import BlameDaemon, RemoteGit
+from git_bbb.git_plumbing import Git
+
+
+@pytest.fixture
+def daemon(repo):
+    repo.commit("file.txt", "first\n", "Add file")
+    server = BlameDaemon(repo.path / "daemon.sock", Git(), idle_timeout=60)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def connect(daemon):
+    return RemoteGit(daemon.server_address, daemon.git.repo_path, None)
+
+
+def test_results_are_served(daemon):
+    remote = connect(daemon)
+
+    assert remote.rev_parse("HEAD") == daemon.git.rev_parse("HEAD")
+    assert remote.cat_file("HEAD", "file.txt") == b"first\n"
+
+
+def test_unexpected_errors_leave_the_connection_usable(daemon):
+    def broken(sha):
+        raise RuntimeError("broken")
+
+    daemon.git.show_commit = broken
+
+    response = daemon.dispatch({"method": "show_commit", "args": ["HEAD"]})
+    assert response == {"error": "RuntimeError: broken"}
+
+    remote = connect(daemon)
+    assert remote._call_daemon("rev_parse", "HEAD")
+    with pytest.raises(Exception):
+        remote._call_daemon("show_commit", "HEAD")
+    assert remote._call_daemon("rev_parse", "HEAD")
+
+
+def test_falls_back_to_local_git_on_daemon_errors(daemon):
+    def broken(sha):
+        raise RuntimeError("broken")
+
+    daemon.git.show_commit = broken
+    remote = connect(daemon)
+
+    assert "Add file" in remote.show_commit("HEAD")
+
+
+def test_falls_back_to_local_git_when_the_daemon_goes_away(daemon):
+    remote = connect(daemon)
+    daemon.shutdown()
+    daemon.server_close()
+    remote._socket.shutdown(2)
+
+    assert remote.rev_parse("HEAD") == daemon.git.rev_parse("HEAD")
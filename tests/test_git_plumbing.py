@@ -0,0 +1,54 @@
+from pathlib import Path
+
+from git_bbb.git_plumbing import LINE_LOG_FIELD_SEPARATOR, TraceStop
+
+SHA = "1" * 40
+
+
+def log_record(hunk: str) -> str:
+    header = LINE_LOG_FIELD_SEPARATOR.join([SHA, "Alice", "1600000000", "Fix"])
+    return (
+        f"{header}\n\n"
+        "diff --git a/f.py b/f.py\n"
+        "--- a/f.py\n"
+        "+++ b/f.py\n"
+        f"{hunk}"
+    )
+
+
+def test_trace_stop_from_log_record():
+    stop = TraceStop.from_log_record(
+        log_record("@@ -10,1 +10,1 @@ def f():\n-old\n+new\n")
+    )
+    assert stop == TraceStop(
+        sha=SHA,
+        path=Path("f.py"),
+        line_number=10,
+        author_name="Alice",
+        author_time=1600000000,
+        summary="Fix",
+    )
+
+
+def test_trace_stop_skips_leading_context_lines():
+    stop = TraceStop.from_log_record(
+        log_record("@@ -10,1 +10,2 @@\n line 9\n+inserted\n")
+    )
+    assert stop.line_number == 11
+
+
+def test_trace_stop_skips_removed_lines():
+    stop = TraceStop.from_log_record(
+        log_record("@@ -10,3 +10,2 @@\n line 9\n-a\n-b\n+c\n line 11\n")
+    )
+    assert stop.line_number == 11
+
+
+def test_trace_stop_without_added_lines_falls_back_to_hunk_start():
+    stop = TraceStop.from_log_record(log_record("@@ -10,2 +10,1 @@\n-a\n b\n"))
+    assert stop.line_number == 10
+
+
+def test_trace_stop_without_diff_is_skipped():
+    header = LINE_LOG_FIELD_SEPARATOR.join([SHA, "Alice", "1600000000", "Fix"])
+    assert TraceStop.from_log_record(f"{header}\n") is None
@@ -0,0 +1,126 @@
+from pathlib import Path
+
+import pytest
+
+from git_bbb.git_plumbing import Git, Hunk
+from git_bbb.line_mapping import LineMap, LineMapper
+
+# Old version has lines 1-10. In the new one, line 3 is replaced by two
+# lines, lines 6 & 7 are removed, and two lines are appended at the end.
+HUNKS = [
+    Hunk(old_start=3, old_count=1, new_start=3, new_count=2),
+    Hunk(old_start=6, old_count=2, new_start=6, new_count=0),
+    Hunk(old_start=10, old_count=0, new_start=10, new_count=2),
+]
+
+
+@pytest.mark.parametrize(
+    "old, new",
+    [
+        # Before any of the hunks
+        (1, 1),
+        (2, 2),
+        # Replaced line
+        (3, 3),
+        # Moved by the inserted line
+        (4, 5),
+        (5, 6),
+        # Removed lines land on the line before them
+        (6, 6),
+        (7, 6),
+        # Moved by both of the hunks
+        (8, 7),
+        (10, 9),
+    ],
+)
+def test_line_map_translates_old_lines(old, new):
+    assert LineMap(HUNKS).translate(old) == new
+
+
+@pytest.mark.parametrize(
+    "new, old",
+    [
+        (2, 2),
+        # Lines replacing a single one are clamped into it
+        (3, 3),
+        (4, 3),
+        (5, 4),
+        (6, 5),
+        (7, 8),
+        (9, 10),
+        # Lines appended at the end of the file land on its last old line
+        (10, 10),
+        (11, 10),
+    ],
+)
+def test_line_map_translates_new_lines(new, old):
+    assert LineMap(HUNKS).translate(new, reverse=True) == old
+
+
+def test_line_map_of_removed_end_of_file():
+    # Last two of 5 lines removed
+    line_map = LineMap([Hunk(4, 2, 3, 0)])
+    assert line_map.translate(4) == 3
+    assert line_map.translate(5) == 3
+    assert line_map.translate(3, reverse=True) == 3
+
+
+def test_line_map_of_lines_inserted_at_the_beginning():
+    line_map = LineMap([Hunk(0, 0, 1, 2)])
+    assert line_map.translate(1) == 3
+    assert line_map.translate(1, reverse=True) == 0
+    assert line_map.translate(3, reverse=True) == 1
+
+
+class CountingGit:
+    def __init__(self, git):
+        self.git = git
+        self.diffs = 0
+
+    def diff_hunks(self, *args):
+        self.diffs += 1
+        return self.git.diff_hunks(*args)
+
+
+@pytest.fixture
+def two_revisions(repo):
+    first = repo.commit("file.txt", "a\nb\nc\n", "First")
+    second = repo.commit("file.txt", "new\na\nb\nc\n", "Second")
+    return first, second
+
+
+def test_line_mapper_translates_between_revisions(two_revisions):
+    first, second = two_revisions
+    mapper = LineMapper(Git())
+    path = Path("file.txt")
+
+    assert mapper.translate(2, (first, path), (second, path)) == 3
+    assert mapper.translate(1, (second, path), (first, path)) == 1
+    assert mapper.translate(3, (second, path), (second, path)) == 3
+
+
+def test_line_mapper_reuses_maps_between_commits(two_revisions):
+    first, second = two_revisions
+    git = CountingGit(Git())
+    mapper = LineMapper(git)
+    path = Path("file.txt")
+
+    mapper.translate(1, (first, path), (second, path))
+    mapper.translate(2, (first, path), (second, path))
+    # Opposite direction uses the same map
+    mapper.translate(3, (second, path), (first, path))
+    assert git.diffs == 1
+
+
+def test_line_mapper_does_not_cache_mutable_revisions(repo, two_revisions):
+    first, _ = two_revisions
+    git = CountingGit(Git())
+    mapper = LineMapper(git)
+    path = Path("file.txt")
+
+    assert mapper.translate(1, (first, path), (None, path)) == 2
+    (repo.path / "file.txt").write_text("newer\nnew\na\nb\nc\n")
+    assert mapper.translate(1, (first, path), (None, path)) == 3
+    assert mapper.translate(1, (first, path), ("HEAD", path)) == 2
+    assert mapper.translate(1, (first, path), ("HEAD", path)) == 2
+    assert git.diffs == 4
@@ -0,0 +1,48 @@
+import pytest
+
+
+def test_o_opens_a_tab(run_with_keys, blamed_file):
+    tabs = run_with_keys(blamed_file, "jo")
+    assert len(tabs._browsers) == 2
+
+
+@pytest.mark.parametrize(
+    "keys",
+    [
+        # Search through file contents
+        "/lo",
+        # Metadata query
+        "Mauthor:o",
+        "MQ",
+        "Mgt",
+    ],
+)
+def test_typing_in_prompts_leaves_tabs_alone(run_with_keys, blamed_file, keys):
+    tabs = run_with_keys(blamed_file, keys)
+    assert len(tabs._browsers) == 1
+    assert not tabs.current.source_has_focus()
+
+
+def test_typing_in_prompts_does_not_close_tabs(run_with_keys, blamed_file):
+    tabs = run_with_keys(blamed_file, "jo/Q")
+    assert len(tabs._browsers) == 2
+
+
+@pytest.fixture
+def slow_repository(monkeypatch):
+    monkeypatch.setattr("git_bbb.doctor.SLOW_REPOSITORY_PACK_SIZE", 0)
+
+
+def test_w_dismisses_doctor_notice(
+    run_with_keys, blamed_file, slow_repository
+):
+    tabs = run_with_keys(blamed_file, "w")
+    assert not tabs._doctor_notice.dismissable
+
+
+@pytest.mark.parametrize("keys", ["/w", "/W", "Mw", "MW"])
+def test_typing_in_prompts_leaves_doctor_notice_alone(
+    run_with_keys, blamed_file, slow_repository, keys
+):
+    tabs = run_with_keys(blamed_file, keys)
+    assert tabs._doctor_notice.fixable
@@ -0,0 +1,161 @@
+import asyncio
+import os
+
+import pytest
+
+from git_bbb import watch
+from git_bbb.watch import BlamePatch, FileWatcher
+
+
+@pytest.fixture(params=["inotify", "polling"])
+def watcher_kind(request, monkeypatch):
+    if request.param == "polling":
+        monkeypatch.setattr(FileWatcher, "_inotify_init", lambda self: None)
+    monkeypatch.setattr(watch, "POLL_INTERVAL", 0.01)
+    monkeypatch.setattr(watch, "DEBOUNCE_DELAY", 0.01)
+    return request.param
+
+
+def test_stopped_watcher_reports_no_changes(tmp_path, watcher_kind):
+    path = tmp_path / "file.txt"
+    path.write_text("first\n")
+    changes = []
+
+    async def main():
+        watcher = FileWatcher(path, lambda: changes.append(path.read_text()))
+        watcher.start()
+        inotify_fd = watcher._inotify_fd
+        # Let polling take the first stat.
+        await asyncio.sleep(0.05)
+        path.write_text("second\n")
+        await asyncio.sleep(0.2)
+        watcher.stop()
+        path.write_text("third\n")
+        await asyncio.sleep(0.2)
+        return inotify_fd
+
+    inotify_fd = asyncio.run(main())
+
+    assert changes[-1] == "second\n"
+    if inotify_fd is not None:
+        with pytest.raises(OSError):
+            os.fstat(inotify_fd)
+
+
+def test_watchers_are_stopped_on_exit(run_with_keys, blamed_file):
+    tabs = run_with_keys(blamed_file, "", watch=True)
+    assert tabs.current._watcher is None
+
+
+def test_watchers_are_stopped_when_closing_tabs(
+    run_with_keys, blamed_file, monkeypatch
+):
+    stopped = []
+    stop = FileWatcher.stop
+    monkeypatch.setattr(
+        FileWatcher, "stop", lambda self: stopped.append(stop(self))
+    )
+
+    # Only the first tab watches the file, and it's the one closed.
+    tabs = run_with_keys(blamed_file, "jogTQ", watch=True)
+
+    assert len(tabs._browsers) == 1
+    assert len(stopped) == 1
+
+
+OLD_LINES = ["a\n", "b\n", "c\n", "d\n", "e\n"]
+
+
+@pytest.fixture
+def old_blames(make_blame):
+    return make_blame("12345", OLD_LINES)
+
+
+@pytest.fixture
+def patch_lines(old_blames, make_blame):
+    def patch_lines(new_lines):
+        """Patch the blame, blaming changed lines on commit "0"."""
+        patch = BlamePatch(old_blames, new_lines)
+        reblamed = make_blame("0" * len(new_lines), new_lines)
+        changed = [
+            reblamed[n - 1]
+            for start, end in patch.changed_line_ranges
+            for n in range(start, end + 1)
+        ]
+        return patch, patch.apply(changed)
+
+    return patch_lines
+
+
+def assert_blamed(blames, new_lines, shas):
+    assert [b.content for b in blames] == new_lines
+    assert [b.sha for b in blames] == list(shas)
+    assert [b.final_line_number for b in blames] == list(
+        range(1, len(new_lines) + 1)
+    )
+
+
+def test_blame_patch_of_replaced_line(patch_lines):
+    new_lines = ["a\n", "B\n", "c\n", "d\n", "e\n"]
+    patch, blames = patch_lines(new_lines)
+
+    assert patch.changed_line_ranges == [(2, 2)]
+    assert not patch.needs_full_reblame
+    assert_blamed(blames, new_lines, "10345")
+    assert [patch.translate_row(row) for row in range(5)] == [0, 1, 2, 3, 4]
+
+
+def test_blame_patch_of_inserted_lines(patch_lines):
+    new_lines = ["a\n", "b\n", "X\n", "Y\n", "c\n", "d\n", "e\n"]
+    patch, blames = patch_lines(new_lines)
+
+    assert patch.changed_line_ranges == [(3, 4)]
+    assert_blamed(blames, new_lines, "1200345")
+    assert [patch.translate_row(row) for row in range(5)] == [0, 1, 4, 5, 6]
+
+
+def test_blame_patch_of_removed_lines(patch_lines):
+    new_lines = ["a\n", "d\n", "e\n"]
+    patch, blames = patch_lines(new_lines)
+
+    assert patch.changed_line_ranges == []
+    assert_blamed(blames, new_lines, "145")
+    # Removed rows land on the row preceding them
+    assert [patch.translate_row(row) for row in range(5)] == [0, 0, 0, 1, 2]
+
+
+@pytest.mark.parametrize(
+    "new_lines, shas, rows",
+    [
+        # Removed from the end
+        (["a\n", "b\n", "c\n"], "123", [0, 1, 2, 2, 2]),
+        # Removed from the beginning
+        (["c\n", "d\n", "e\n"], "345", [0, 0, 0, 1, 2]),
+        # Everything removed
+        ([], "", [0, 0, 0, 0, 0]),
+    ],
+)
+def test_blame_patch_of_lines_removed_at_the_edges(
+    patch_lines, new_lines, shas, rows
+):
+    patch, blames = patch_lines(new_lines)
+
+    assert_blamed(blames, new_lines, shas)
+    assert [patch.translate_row(row) for row in range(5)] == rows
+
+
+def test_blame_patch_of_lines_added_at_the_end(patch_lines):
+    new_lines = [*OLD_LINES, "f\n", "g\n"]
+    patch, blames = patch_lines(new_lines)
+
+    assert patch.changed_line_ranges == [(6, 7)]
+    assert_blamed(blames, new_lines, "1234500")
+    assert [patch.translate_row(row) for row in range(5)] == [0, 1, 2, 3, 4]
+
+
+def test_blame_patch_of_mostly_changed_file(old_blames):
+    new_lines = ["a\n", "B\n", "C\n", "D\n", "e\n"]
+    patch = BlamePatch(old_blames, new_lines)
+
+    assert patch.changed_line_ranges == [(2, 4)]
+    assert patch.needs_full_reblame